@@ -0,0 +1,127 @@
+"""Measure the per test case parse cost of the junit parser
+
+Usage: python benchmarks/bench_parse.py [number of test cases]
+
+The "parse_test_case_elem" line is the Python side of the per test case
+cost: attribute decoding and object creation on an already built tree.
+The "filter" lines parse with a CaseFilter keeping the 5% of failures, or
+accepting every test case, to compare against the unfiltered parse.
+"""
+
+from lxml import etree
+import os
+import sys
+import tempfile
+import time
+
+from onefile.junit import (
+    CaseFilter,
+    merge_junit_files,
+    parse_junit_xml,
+    parse_test_case_elem,
+)
+
+SUITES = 10
+
+
+def write_junit_file(file_path: str, test_case_count: int) -> None:
+    root = etree.Element("testsuites")
+    for suite_index in range(SUITES):
+        test_suite_elem = etree.SubElement(
+            root,
+            "testsuite",
+            name="pytest",
+            errors="0",
+            failures="0",
+            skipped="0",
+            tests=str(test_case_count // SUITES),
+            time="123.456",
+            # Timestamps repeat across shards of the same run
+            timestamp=f"2024-01-07T18:4{suite_index % 3}:28.776987",
+            hostname="localhost",
+        )
+        for case_index in range(test_case_count // SUITES):
+            test_case_elem = etree.SubElement(
+                test_suite_elem,
+                "testcase",
+                classname=f"tests.test_module_{case_index % 50}.TestClass",
+                name=f"test_case[{suite_index}-{case_index}]",
+                file=f"tests/test_module_{case_index % 50}.py",
+                line=str(case_index),
+                time=f"{case_index % 1000 / 1000:.3f}",
+            )
+            if case_index % 20 == 0:
+                failure_elem = etree.SubElement(
+                    test_case_elem, "failure", message="AssertionError"
+                )
+                failure_elem.text = "Traceback (most recent call last):\n"
+    etree.ElementTree(root).write(file_path, encoding="utf-8")
+
+
+def measure(label: str, test_case_count: int, func) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<24} {elapsed:8.3f} s "
+        f"{elapsed / test_case_count * 1e6:8.2f} us/case"
+    )
+
+
+def main() -> None:
+    test_case_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, "junit.xml")
+        write_junit_file(file_path, test_case_count)
+        root = etree.parse(file_path).getroot()
+
+        def parse_test_cases():
+            for test_suite_elem in root:
+                for test_case_elem in test_suite_elem:
+                    parse_test_case_elem(test_case_elem)
+
+        measure(
+            "lxml tree only",
+            test_case_count,
+            lambda: etree.parse(file_path),
+        )
+        measure("parse_test_case_elem", test_case_count, parse_test_cases)
+        measure(
+            "parse_junit_xml",
+            test_case_count,
+            lambda: parse_junit_xml([file_path]),
+        )
+        measure(
+            "parse_junit_xml (mmap)",
+            test_case_count,
+            lambda: parse_junit_xml([file_path], use_mmap=True),
+        )
+        failures_only = CaseFilter(outcomes={"failure"})
+        measure(
+            "parse_junit_xml (filter)",
+            test_case_count,
+            lambda: parse_junit_xml([file_path], case_filter=failures_only),
+        )
+        accept_all = CaseFilter(min_time=0)
+        measure(
+            "parse_junit_xml (all)",
+            test_case_count,
+            lambda: parse_junit_xml([file_path], case_filter=accept_all),
+        )
+        output_path = os.path.join(tmp_dir, "merged.xml")
+        measure(
+            "merge_junit_files",
+            test_case_count,
+            lambda: merge_junit_files([file_path], output_path),
+        )
+        measure(
+            "merge_junit_files (filter)",
+            test_case_count,
+            lambda: merge_junit_files(
+                [file_path], output_path, case_filter=failures_only
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
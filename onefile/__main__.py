@@ -0,0 +1,5 @@
+import sys
+
+from onefile.cli import main
+
+sys.exit(main())
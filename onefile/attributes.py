@@ -0,0 +1,64 @@
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+# Timestamp of the test suites and reports that have none. It is older than
+# any real timestamp, so such inputs never win over timestamped ones, and the
+# merge result does not depend on when the merge runs. Between themselves,
+# the later input wins, see is_latest_timestamp.
+FALLBACK_TIMESTAMP = datetime(1970, 1, 1)
+
+REPORT_TIMESTAMP_FORMAT = "%d-%b-%Y at %H:%M:%S"
+
+# Shards of the same run share a handful of distinct timestamps
+TIMESTAMP_CACHE_SIZE = 1024
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_iso_timestamp(value: str) -> datetime:
+    """Parse a junit timestamp attribute, cached by value"""
+    if not value:
+        return FALLBACK_TIMESTAMP
+    return datetime.fromisoformat(value)
+
+
+@lru_cache(maxsize=TIMESTAMP_CACHE_SIZE)
+def parse_report_timestamp(value: str) -> datetime:
+    """Parse the "Report generated on" date of a pytest-html report
+
+    The ISO format of str(datetime) is accepted too, older merged reports
+    were written with it.
+    """
+    if not value:
+        return FALLBACK_TIMESTAMP
+    try:
+        return datetime.strptime(value, REPORT_TIMESTAMP_FORMAT)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def format_report_timestamp(timestamp: Optional[datetime]) -> str:
+    """Format a date like the "Report generated on" one of pytest-html"""
+    if timestamp is None:
+        return ""
+    return timestamp.strftime(REPORT_TIMESTAMP_FORMAT)
+
+
+def is_latest_timestamp(
+    timestamp: datetime, latest_timestamp: Optional[datetime]
+) -> bool:
+    """Return True when timestamp is the latest one so far
+
+    Among inputs without a timestamp, the later input wins, like it did
+    when they were given the time of the merge.
+    """
+    return (
+        latest_timestamp is None
+        or timestamp > latest_timestamp
+        or timestamp == latest_timestamp == FALLBACK_TIMESTAMP
+    )
+
+
+def parse_leading_int(text: str) -> int:
+    """Parse the number in front of a counter text like "4 passed" """
+    return int(text.split(" ", 1)[0])
@@ -0,0 +1,238 @@
+from typing import Optional
+import argparse
+import os
+import sys
+
+from onefile import policies
+from onefile.diff import NEW_FAILURE, diff_test_runs, diff_test_suites
+from onefile.junit import (
+    CaseFilter,
+    merge_junit_files,
+    merge_test_suites,
+    parse_junit_xml,
+)
+from onefile.report_html import (
+    merge_report_html_files,
+    merge_test_runs,
+    parse_report_html_files,
+)
+from onefile.server import serve as serve_merges
+from onefile.watch import watch_junit_files, watch_report_html_files
+
+POLICIES = {
+    "latest": policies.latest_wins,
+    "worst": policies.worst_outcome_wins,
+    "best": policies.best_outcome_wins,
+    "longest": policies.longest_wins,
+}
+
+
+def file_format(file_path: str) -> str:
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".xml":
+        return "junit"
+    if extension in (".html", ".htm"):
+        return "html"
+    raise SystemExit(f"Unknown file format: {file_path}")
+
+
+def merge(args: argparse.Namespace) -> int:
+    formats = {file_format(file_path) for file_path in args.files}
+    if len(formats) != 1:
+        raise SystemExit("Cannot merge junit.xml and report.html files")
+    policy = POLICIES[args.policy]
+
+    if formats == {"junit"}:
+        case_filter = None
+        if args.outcomes or args.classname or args.min_time is not None:
+            case_filter = CaseFilter(
+                outcomes=args.outcomes.split(",") if args.outcomes else None,
+                classname=args.classname,
+                min_time=args.min_time,
+            )
+        merge_junit_files(
+            args.files,
+            args.output or "junit.xml",
+            use_mmap=args.mmap,
+            memory_limit=args.memory_limit,
+            policy=policy,
+            case_filter=case_filter,
+        )
+    else:
+        merge_report_html_files(
+            args.files,
+            args.output or "report.html",
+            page_size=args.page_size,
+            use_mmap=args.mmap,
+            policy=policy,
+        )
+    return 0
+
+
+def watch(args: argparse.Namespace) -> int:
+    if args.format == "junit":
+        watch_junit_files(
+            args.directory,
+            args.output or "junit.xml",
+            interval=args.interval,
+            debounce=args.debounce,
+            idle_timeout=args.idle_timeout,
+        )
+    else:
+        watch_report_html_files(
+            args.directory,
+            args.output or "report.html",
+            interval=args.interval,
+            debounce=args.debounce,
+            idle_timeout=args.idle_timeout,
+        )
+    return 0
+
+
+def diff(args: argparse.Namespace) -> int:
+    formats = {file_format(args.old), file_format(args.new)}
+    if len(formats) != 1:
+        raise SystemExit("Cannot diff a junit.xml and a report.html file")
+
+    if formats == {"junit"}:
+        differences = diff_test_suites(
+            merge_test_suites(parse_junit_xml([args.old])),
+            merge_test_suites(parse_junit_xml([args.new])),
+            duration_ratio=args.duration_ratio,
+            duration_delta=args.duration_delta,
+        )
+    else:
+        differences = diff_test_runs(
+            merge_test_runs(parse_report_html_files([args.old])),
+            merge_test_runs(parse_report_html_files([args.new])),
+            duration_ratio=args.duration_ratio,
+            duration_delta=args.duration_delta,
+        )
+
+    kinds = set(args.kinds.split(",")) if args.kinds else None
+    has_new_failures = False
+    for difference in differences:
+        has_new_failures |= difference.kind == NEW_FAILURE
+        if kinds is None or difference.kind in kinds:
+            print(f"{difference.kind}\t{difference.name}\t{difference.detail}")
+    return 1 if args.exit_code and has_new_failures else 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    serve_merges(
+        args.host,
+        args.port,
+        max_workers=args.max_workers,
+        max_pending_uploads=args.max_pending_uploads,
+        max_upload_size=args.max_upload_size,
+        policy=POLICIES[args.policy],
+    )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="onefile", description="Merge multiple files into one!"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="merge junit.xml or report.html files"
+    )
+    merge_parser.add_argument("files", nargs="+")
+    merge_parser.add_argument("-o", "--output")
+    merge_parser.add_argument(
+        "--policy", choices=sorted(POLICIES), default="latest"
+    )
+    merge_parser.add_argument(
+        "--mmap", action="store_true", help="read the inputs memory-mapped"
+    )
+    merge_parser.add_argument(
+        "--memory-limit",
+        type=int,
+        help="junit: merge on disk with this memory ceiling in bytes",
+    )
+    merge_parser.add_argument(
+        "--outcomes", help="junit: comma separated outcomes to keep"
+    )
+    merge_parser.add_argument(
+        "--classname", help="junit: fnmatch pattern of classnames to keep"
+    )
+    merge_parser.add_argument(
+        "--min-time", type=float, help="junit: minimum duration to keep"
+    )
+    merge_parser.add_argument(
+        "--page-size", type=int, help="html: result rows per page file"
+    )
+    merge_parser.set_defaults(func=merge)
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="merge the shards landing in a directory"
+    )
+    watch_parser.add_argument("format", choices=("junit", "html"))
+    watch_parser.add_argument("directory")
+    watch_parser.add_argument("-o", "--output")
+    watch_parser.add_argument("--interval", type=float, default=1.0)
+    watch_parser.add_argument("--debounce", type=float, default=2.0)
+    watch_parser.add_argument("--idle-timeout", type=float)
+    watch_parser.set_defaults(func=watch)
+
+    diff_parser = subparsers.add_parser(
+        "diff", help="compare two merged junit.xml or report.html files"
+    )
+    diff_parser.add_argument("old")
+    diff_parser.add_argument("new")
+    diff_parser.add_argument(
+        "--kinds", help="comma separated kinds of differences to print"
+    )
+    diff_parser.add_argument(
+        "--duration-ratio",
+        type=float,
+        default=0.5,
+        help="relative slowdown of a duration regression (0.5 = 50%%)",
+    )
+    diff_parser.add_argument(
+        "--duration-delta",
+        type=float,
+        default=1.0,
+        help="minimum slowdown of a duration regression in seconds",
+    )
+    diff_parser.add_argument(
+        "--exit-code",
+        action="store_true",
+        help="exit with 1 when there are new failures",
+    )
+    diff_parser.set_defaults(func=diff)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="merge the files uploaded over HTTP"
+    )
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument(
+        "--policy", choices=sorted(POLICIES), default="latest"
+    )
+    serve_parser.add_argument(
+        "--max-workers", type=int, default=4, help="parsing threads"
+    )
+    serve_parser.add_argument(
+        "--max-pending-uploads",
+        type=int,
+        default=16,
+        help="uploads read at once, the others wait",
+    )
+    serve_parser.add_argument(
+        "--max-upload-size", type=int, default=256 * 1024 * 1024
+    )
+    serve_parser.set_defaults(func=serve)
+
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
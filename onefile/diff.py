@@ -0,0 +1,149 @@
+from typing import Any, Hashable, Iterator, Optional
+import logging
+
+from onefile import init_onefile
+from onefile.junit import TestSuite
+from onefile.policies import (
+    KeyFunction,
+    classname_name_key,
+    duration,
+    node_id_key,
+    outcome,
+)
+from onefile.report_html import TestRunSummary
+
+init_onefile()
+
+FAILING_OUTCOMES = frozenset(("failure", "failed", "error"))
+PASSING_OUTCOMES = frozenset(("passed", "xpassed", "xfailed"))
+
+NEW_FAILURE = "new_failure"
+FIXED = "fixed"
+NEWLY_SKIPPED = "newly_skipped"
+DURATION_REGRESSION = "duration_regression"
+ADDED = "added"
+REMOVED = "removed"
+
+
+class Difference:
+    def __init__(
+        self,
+        kind: str,
+        key: Hashable,
+        old: Optional[Any] = None,
+        new: Optional[Any] = None,
+    ):
+        self.kind = kind
+        self.key = key
+        self.old = old
+        self.new = new
+
+    @property
+    def name(self) -> str:
+        test = self.new if self.new is not None else self.old
+        if hasattr(test, "test"):
+            return test.test
+        return f"{test.classname}::{test.name}"
+
+    @property
+    def detail(self) -> str:
+        if self.kind == DURATION_REGRESSION:
+            return f"{duration(self.old)}s -> {duration(self.new)}s"
+        return (
+            f"{outcome(self.old) if self.old is not None else '-'} -> "
+            f"{outcome(self.new) if self.new is not None else '-'}"
+        )
+
+    def __repr__(self):
+        return (
+            f"Difference(kind='{self.kind}', name='{self.name}', "
+            f"detail='{self.detail}')"
+        )
+
+
+def diff_tests(
+    old_tests: dict[Hashable, Any],
+    new_tests: Iterator[tuple[Hashable, Any]],
+    duration_ratio: float = 0.5,
+    duration_delta: float = 1.0,
+) -> Iterator[Difference]:
+    """Yield the differences between indexed old tests and new tests
+
+    old_tests is consumed. A duration regression is reported when the new
+    duration exceeds the old one by more than duration_ratio (0.5 = 50%)
+    and by at least duration_delta seconds.
+    """
+    for test_key, new_test in new_tests:
+        old_test = old_tests.pop(test_key, None)
+        new_outcome = outcome(new_test)
+        if old_test is None:
+            if new_outcome in FAILING_OUTCOMES:
+                yield Difference(NEW_FAILURE, test_key, None, new_test)
+            else:
+                yield Difference(ADDED, test_key, None, new_test)
+            continue
+
+        old_outcome = outcome(old_test)
+        if new_outcome in FAILING_OUTCOMES:
+            if old_outcome not in FAILING_OUTCOMES:
+                yield Difference(NEW_FAILURE, test_key, old_test, new_test)
+        elif old_outcome in FAILING_OUTCOMES:
+            if new_outcome in PASSING_OUTCOMES:
+                yield Difference(FIXED, test_key, old_test, new_test)
+        if new_outcome == "skipped" and old_outcome != "skipped":
+            yield Difference(NEWLY_SKIPPED, test_key, old_test, new_test)
+
+        old_duration = duration(old_test)
+        new_duration = duration(new_test)
+        if (
+            new_duration - old_duration >= duration_delta
+            and new_duration > old_duration * (1 + duration_ratio)
+        ):
+            yield Difference(DURATION_REGRESSION, test_key, old_test, new_test)
+
+    for test_key, old_test in old_tests.items():
+        yield Difference(REMOVED, test_key, old_test, None)
+
+
+def diff_test_suites(
+    old_test_suite: TestSuite,
+    new_test_suite: TestSuite,
+    key: KeyFunction = classname_name_key,
+    duration_ratio: float = 0.5,
+    duration_delta: float = 1.0,
+) -> Iterator[Difference]:
+    """Yield the differences between two merged junit test suites"""
+    logging.info("Diff test suites")
+    old_test_cases = {
+        key(test_case, old_test_suite): test_case
+        for test_case in old_test_suite.test_cases
+    }
+    new_test_cases = (
+        (key(test_case, new_test_suite), test_case)
+        for test_case in new_test_suite.test_cases
+    )
+    return diff_tests(
+        old_test_cases, new_test_cases, duration_ratio, duration_delta
+    )
+
+
+def diff_test_runs(
+    old_test_run_summary: TestRunSummary,
+    new_test_run_summary: TestRunSummary,
+    key: KeyFunction = node_id_key,
+    duration_ratio: float = 0.5,
+    duration_delta: float = 1.0,
+) -> Iterator[Difference]:
+    """Yield the differences between two merged report.html test runs"""
+    logging.info("Diff test runs")
+    old_test_results = {
+        key(test_result, old_test_run_summary): test_result
+        for test_result in old_test_run_summary.test_results
+    }
+    new_test_results = (
+        (key(test_result, new_test_run_summary), test_result)
+        for test_result in new_test_run_summary.test_results
+    )
+    return diff_tests(
+        old_test_results, new_test_results, duration_ratio, duration_delta
+    )
@@ -1,10 +1,31 @@
 from datetime import datetime
 from lxml import etree
-from typing import Optional
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import (
+    BinaryIO,
+    Hashable,
+    Iterable,
+    Iterator,
+    Optional,
+    Union,
+)
+import fnmatch
 import logging
-import os
+import re
 
 from onefile import init_onefile
+from onefile.attributes import is_latest_timestamp, parse_iso_timestamp
+from onefile.mmap_reader import open_mmap, parse_mmap
+from onefile.policies import (
+    KeyFunction,
+    ResolutionPolicy,
+    OUTCOME_POLICIES,
+    classname_name_key,
+    latest_wins,
+    outcome,
+)
+from onefile.spill import SpillSorter
 
 init_onefile()
 
@@ -71,6 +92,170 @@ class TestCase:
         )
 
 
+class CaseTally:
+    """Stand-in for a test case rejected by a CaseFilter
+
+    Only what the merge needs to resolve duplicates and to count outcomes is
+    kept, error, failure and skipped are True or None instead of messages.
+    The junit writers skip tallies.
+    """
+
+    __slots__ = (
+        "classname",
+        "name",
+        "file",
+        "line",
+        "time",
+        "error",
+        "failure",
+        "skipped",
+    )
+
+    def __init__(self, test_case_elem: etree._Element):
+        get = test_case_elem.get
+        self.classname = get("classname", "")
+        self.name = get("name", "")
+        self.file = get("file", None)
+        self.line = get("line", None)
+        self.time = float(get("time", 0.0))
+        self.error, self.failure, self.skipped = None, None, None
+        for child_elem in test_case_elem:
+            if child_elem.tag == "error":
+                self.error = True
+            elif child_elem.tag == "failure":
+                self.failure = True
+            elif child_elem.tag == "skipped":
+                self.skipped = True
+
+    @classmethod
+    def shared(cls, test_case: "CaseTally") -> "CaseTally":
+        """Return the tally shared by the test cases with the same outcome
+
+        It has no identity nor duration, and stands in for a merged tally
+        when the resolution policy only looks at outcomes.
+        """
+        flags = (
+            test_case.error or None,
+            test_case.failure or None,
+            test_case.skipped or None,
+        )
+        tally = SHARED_CASE_TALLIES.get(flags)
+        if tally is None:
+            tally = cls.__new__(cls)
+            tally.classname, tally.name = "", ""
+            tally.file, tally.line, tally.time = None, None, 0.0
+            tally.error, tally.failure, tally.skipped = flags
+            SHARED_CASE_TALLIES[flags] = tally
+        return tally
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return (
+            f"CaseTally(classname='{self.classname}', name='{self.name}', "
+            f"time='{self.time}', outcome='{outcome(self)}')"
+        )
+
+
+# (error, failure, skipped) -> CaseTally, see CaseTally.shared
+SHARED_CASE_TALLIES: dict[tuple, CaseTally] = {}
+
+
+def case_elem_outcome(test_case_elem: etree._Element) -> str:
+    """Return the outcome of a testcase element, the same as outcome()"""
+    if not len(test_case_elem):
+        return "passed"
+    is_failure, is_skipped = False, False
+    for child_elem in test_case_elem:
+        tag = child_elem.tag
+        if tag == "error":
+            return "error"
+        if tag == "failure":
+            is_failure = True
+        elif tag == "skipped":
+            is_skipped = True
+    if is_failure:
+        return "failure"
+    if is_skipped:
+        return "skipped"
+    return "passed"
+
+
+class CaseFilter:
+    """Select the junit test cases to keep while parsing
+
+    outcomes is a set of "passed", "failure", "error" and "skipped",
+    classname an fnmatch pattern ("tests.api.*" for a prefix) and min_time
+    the minimum duration in seconds. The test cases must match every given
+    criterion.
+    """
+
+    OUTCOMES = frozenset(("passed", "failure", "error", "skipped"))
+
+    def __init__(
+        self,
+        outcomes: Optional[Iterable[str]] = None,
+        classname: Optional[str] = None,
+        min_time: Optional[float] = None,
+    ):
+        self.outcomes = frozenset(outcomes) if outcomes is not None else None
+        if self.outcomes is not None and not self.outcomes <= self.OUTCOMES:
+            raise ValueError(
+                f"Unknown outcomes: {sorted(self.outcomes - self.OUTCOMES)}"
+            )
+        self.classname = classname
+        self.min_time = min_time
+        self.match_classname = (
+            re.compile(fnmatch.translate(classname)).match
+            if classname is not None
+            else None
+        )
+
+    def accepts_elem(self, test_case_elem: etree._Element) -> bool:
+        """Same as accepts, from the testcase element before any parsing"""
+        get = test_case_elem.get
+        if self.match_classname is not None and not self.match_classname(
+            get("classname", "")
+        ):
+            return False
+        if (
+            self.min_time is not None
+            and float(get("time", 0.0)) < self.min_time
+        ):
+            return False
+        if (
+            self.outcomes is not None
+            and case_elem_outcome(test_case_elem) not in self.outcomes
+        ):
+            return False
+        return True
+
+    def accepts(self, test_case: Union[TestCase, CaseTally]) -> bool:
+        if (
+            self.outcomes is not None
+            and outcome(test_case) not in self.outcomes
+        ):
+            return False
+        if self.classname is not None and not fnmatch.fnmatchcase(
+            test_case.classname, self.classname
+        ):
+            return False
+        if self.min_time is not None and test_case.time < self.min_time:
+            return False
+        return True
+
+    def __repr__(self):
+        return (
+            f"CaseFilter(outcomes={self.outcomes}, "
+            f"classname='{self.classname}', min_time={self.min_time})"
+        )
+
+
 class TestSuite:
     def __init__(
         self,
@@ -91,7 +276,9 @@ class TestSuite:
         self.time = time
         self.timestamp = timestamp
         self.hostname = hostname
-        self.test_cases: list[TestCase] = []
+        self.test_cases: list[Union[TestCase, CaseTally]] = []
+        # Merge key -> index in test_cases, maintained by fold_test_suite
+        self.test_case_index: dict[Hashable, int] = {}
 
     def add_test_case(self, test_case: TestCase) -> None:
         self.test_cases.append(test_case)
@@ -117,157 +304,336 @@ class TestSuites:
         return f"TestSuites(test_suites={self.test_suites})"
 
 
-def parse_junit_xml(file_paths: list[str]) -> TestSuites:
-    logging.info("Parse junit XML files into classes")
-    test_suites = TestSuites()
-    for file_path in file_paths:
-        tree = etree.parse(file_path)
-        root = tree.getroot()
+def parse_test_suite_elem(test_suite_elem: etree._Element) -> TestSuite:
+    """Create a TestSuite, without its test cases, from a testsuite element"""
+    get = test_suite_elem.get
+    return TestSuite(
+        name=get("name", ""),
+        errors=int(get("errors", 0)),
+        failures=int(get("failures", 0)),
+        skipped=int(get("skipped", 0)),
+        tests=int(get("tests", 0)),
+        time=float(get("time", 0.0)),
+        timestamp=parse_iso_timestamp(get("timestamp", "")),
+        hostname=get("hostname", ""),
+    )
 
-        for test_suite_elem in root:
-            test_suite = TestSuite(
-                name=test_suite_elem.get("name", ""),
-                errors=int(test_suite_elem.get("errors", 0)),
-                failures=int(test_suite_elem.get("failures", 0)),
-                skipped=int(test_suite_elem.get("skipped", 0)),
-                tests=int(test_suite_elem.get("tests", 0)),
-                time=float(test_suite_elem.get("time", 0.0)),
-                timestamp=(
-                    datetime.fromisoformat(test_suite_elem.get("timestamp"))
-                    if test_suite_elem.get("timestamp")
-                    else datetime.now()
-                ),
-                hostname=test_suite_elem.get("hostname", ""),
+
+def parse_test_case_elem(test_case_elem: etree._Element) -> TestCase:
+    """Create a TestCase from a testcase element"""
+    error, failure, skipped = None, None, None
+
+    for child_elem in test_case_elem:
+        if child_elem.tag == "error" and error is None:
+            error = Error(
+                message=child_elem.get("message", ""),
+                text=child_elem.text,
+            )
+        elif child_elem.tag == "failure" and failure is None:
+            failure = Failure(
+                message=child_elem.get("message", ""),
+                text=child_elem.text,
+            )
+        elif child_elem.tag == "skipped" and skipped is None:
+            skipped = Skipped(
+                skip_type=child_elem.get("type", ""),
+                message=child_elem.get("message", ""),
+                text=child_elem.text,
             )
 
-            for test_case_elem in test_suite_elem:
-                error, failure, skipped = None, None, None
+    get = test_case_elem.get
+    return TestCase(
+        classname=get("classname", ""),
+        name=get("name", ""),
+        file=get("file", None),
+        line=get("line", None),
+        time=float(get("time", 0.0)),
+        error=error,
+        failure=failure,
+        skipped=skipped,
+    )
 
-                if (error_elem := test_case_elem.find("error")) is not None:
-                    error = Error(
-                        message=error_elem.get("message", ""),
-                        text=error_elem.text,
-                    )
 
-                if (
-                    failure_elem := test_case_elem.find("failure")
-                ) is not None:
-                    failure = Failure(
-                        message=failure_elem.get("message", ""),
-                        text=failure_elem.text,
-                    )
+def select_test_case_elem(
+    test_case_elem: etree._Element, case_filter: CaseFilter
+) -> Union[TestCase, CaseTally]:
+    """Create a TestCase if the filter accepts it, a CaseTally otherwise"""
+    if case_filter.accepts_elem(test_case_elem):
+        return parse_test_case_elem(test_case_elem)
+    return CaseTally(test_case_elem)
+
+
+def iterparse_junit_xml(
+    file_path: str, use_mmap: bool = False
+) -> Iterator[etree._Element]:
+    """Yield the testsuite elements at their start and the testcase ones
+
+    The testcase elements are freed once consumed, so the memory use does
+    not grow with the size of the file.
+    """
+    opener = open_mmap(file_path) if use_mmap else open(file_path, "rb")
+    with opener as source:
+        for event, elem in etree.iterparse(
+            source,
+            events=("start", "end"),
+            tag=("testsuite", "testcase"),
+            huge_tree=True,
+        ):
+            if elem.tag == "testsuite":
+                if event == "start":
+                    yield elem
+                else:
+                    elem.clear()
+            elif event == "end":
+                yield elem
+                elem.clear(keep_tail=True)
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+
+
+def parse_junit_xml(
+    file_paths: list[str],
+    use_mmap: bool = False,
+    case_filter: Optional[CaseFilter] = None,
+) -> TestSuites:
+    """Parse junit XML files into classes
+
+    With use_mmap the files are read through a memory map instead of being
+    opened by lxml itself, see onefile.mmap_reader.
+
+    With case_filter the rejected test cases become CaseTally objects
+    instead of TestCase ones, see CaseFilter.
+    """
+    logging.info("Parse junit XML files into classes")
+    test_suites = TestSuites()
+    for file_path in file_paths:
+        if use_mmap:
+            root = parse_mmap(file_path, etree.XMLParser(huge_tree=True))
+        else:
+            tree = etree.parse(file_path)
+            root = tree.getroot()
 
-                if (
-                    skipped_elem := test_case_elem.find("skipped")
-                ) is not None:
-                    skipped = Skipped(
-                        skip_type=skipped_elem.get("type", ""),
-                        message=skipped_elem.get("message", ""),
-                        text=skipped_elem.text,
+        for test_suite_elem in root:
+            test_suite = parse_test_suite_elem(test_suite_elem)
+            if case_filter is None:
+                for test_case_elem in test_suite_elem:
+                    test_suite.add_test_case(
+                        parse_test_case_elem(test_case_elem)
+                    )
+            else:
+                for test_case_elem in test_suite_elem:
+                    test_suite.add_test_case(
+                        select_test_case_elem(test_case_elem, case_filter)
                     )
-
-                test_case = TestCase(
-                    classname=test_case_elem.get("classname", ""),
-                    name=test_case_elem.get("name", ""),
-                    file=test_case_elem.get("file", None),
-                    line=test_case_elem.get("line", None),
-                    time=float(test_case_elem.get("time", 0.0)),
-                    error=error,
-                    failure=failure,
-                    skipped=skipped,
-                )
-                test_suite.add_test_case(test_case)
 
             test_suites.add_test_suite(test_suite)
     return test_suites
 
 
-def merge_test_suites(test_suites: TestSuites) -> TestSuite:
+def merge_test_suites(
+    test_suites: TestSuites,
+    key: KeyFunction = classname_name_key,
+    policy: ResolutionPolicy = latest_wins,
+) -> TestSuite:
     """Merge all test suites into one test suite and return it"""
     logging.info("Let's merge test suites!")
     final_test_suite = TestSuite()
     for test_suite in test_suites.test_suites:
-        logging.debug(f"Test suite: {test_suite}")
-        final_test_suite.name = test_suite.name
-        final_test_suite.hostname = test_suite.hostname
+        fold_test_suite(final_test_suite, test_suite, key, policy)
 
-        logging.debug("Sum all the test suite time")
-        final_test_suite.time += test_suite.time
+    drop_case_tallies(final_test_suite)
+    return final_test_suite
 
-        logging.debug("Find the latest timestamp")
-        is_test_suite_timestamp_updated = False
-        if (
-            final_test_suite.timestamp is None
-            or test_suite.timestamp > final_test_suite.timestamp
-        ):
-            final_test_suite.timestamp = test_suite.timestamp
-            is_test_suite_timestamp_updated = True
-
-        for loaded_testcase in test_suite.test_cases:
-            logging.debug(f"Loaded Test case: {loaded_testcase}")
-            existing_tc_index = next(
-                (
-                    index
-                    for index, tc in enumerate(final_test_suite.test_cases)
-                    if tc.classname == loaded_testcase.classname
-                    and tc.name == loaded_testcase.name
-                ),
-                None,
-            )
 
-            if existing_tc_index is not None:
-                logging.debug("Test case found!")
-                if is_test_suite_timestamp_updated:
-                    logging.debug("Test suite timestamp is updated!")
-                    logging.debug(
-                        "Update final test suite errors, failures, skipped"
-                    )
-                    existing_tc = final_test_suite.test_cases[
-                        existing_tc_index
-                    ]
-
-                    if loaded_testcase.error and not existing_tc.error:
-                        logging.debug("Increase errors attribute!")
-                        final_test_suite.errors += 1
-                    elif not loaded_testcase.error and existing_tc.error:
-                        logging.debug("Decrease errors attribute!")
-                        final_test_suite.errors -= 1
-
-                    if loaded_testcase.failure and not existing_tc.failure:
-                        logging.debug("Increase failures attribute!")
-                        final_test_suite.failures += 1
-                    elif not loaded_testcase.failure and existing_tc.failure:
-                        logging.debug("Decrease failures attribute!")
-                        final_test_suite.failures -= 1
-
-                    if loaded_testcase.skipped and not existing_tc.skipped:
-                        logging.debug("Increase skipped attribute!")
-                        final_test_suite.skipped += 1
-                    elif not loaded_testcase.skipped and existing_tc.skipped:
-                        logging.debug("Decrease skipped attribute!")
-                        final_test_suite.skipped -= 1
+def drop_case_tallies(test_suite: TestSuite) -> None:
+    """Remove the CaseTally objects from a merged test suite
+
+    The counters keep counting them. No more test suites should be folded
+    into the test suite afterwards, the keys of the tallies are forgotten.
+    """
+    new_positions = {}
+    test_cases = []
+    for position, test_case in enumerate(test_suite.test_cases):
+        if not isinstance(test_case, CaseTally):
+            new_positions[position] = len(test_cases)
+            test_cases.append(test_case)
+    if len(test_cases) == len(test_suite.test_cases):
+        return
+
+    test_suite.test_cases = test_cases
+    test_suite.test_case_index = {
+        test_case_key: new_positions[position]
+        for test_case_key, position in test_suite.test_case_index.items()
+        if position in new_positions
+    }
+
+
+def fold_test_suite_attributes(
+    final_test_suite: TestSuite, test_suite: TestSuite
+) -> bool:
+    """Merge the attributes of a test suite, without its test cases
+
+    Return True when the test suite has the latest timestamp so far, its test
+    cases then replace the already merged ones.
+    """
+    final_test_suite.name = test_suite.name
+    final_test_suite.hostname = test_suite.hostname
+
+    logging.debug("Sum all the test suite time")
+    final_test_suite.time += test_suite.time
+
+    logging.debug("Find the latest timestamp")
+    if is_latest_timestamp(test_suite.timestamp, final_test_suite.timestamp):
+        final_test_suite.timestamp = test_suite.timestamp
+        return True
+    return False
+
+
+def fold_test_suite(
+    final_test_suite: TestSuite,
+    test_suite: TestSuite,
+    key: KeyFunction = classname_name_key,
+    policy: ResolutionPolicy = latest_wins,
+) -> None:
+    """Merge one test suite into an already merged test suite in place
+
+    The test cases are identified by key and the duplicates are resolved by
+    policy, see onefile.policies. When the policy only looks at outcomes,
+    the merged tallies are the shared ones of CaseTally.shared.
+    """
+    logging.debug("Test suite: %s", test_suite)
+    is_test_suite_timestamp_updated = fold_test_suite_attributes(
+        final_test_suite, test_suite
+    )
+    test_case_index = final_test_suite.test_case_index
+    shares_tallies = policy in OUTCOME_POLICIES
+
+    for loaded_testcase in test_suite.test_cases:
+        logging.debug("Loaded Test case: %s", loaded_testcase)
+        test_case_key = key(loaded_testcase, test_suite)
+        if shares_tallies and isinstance(loaded_testcase, CaseTally):
+            loaded_testcase = CaseTally.shared(loaded_testcase)
+        existing_tc_index = test_case_index.get(test_case_key)
+
+        if existing_tc_index is not None:
+            logging.debug("Test case found!")
+            existing_tc = final_test_suite.test_cases[existing_tc_index]
+            if policy(
+                existing_tc, loaded_testcase, is_test_suite_timestamp_updated
+            ):
+                logging.debug("Loaded test case wins!")
+                logging.debug(
+                    "Update final test suite errors, failures, skipped"
+                )
 
+                if loaded_testcase.error and not existing_tc.error:
+                    logging.debug("Increase errors attribute!")
+                    final_test_suite.errors += 1
+                elif not loaded_testcase.error and existing_tc.error:
+                    logging.debug("Decrease errors attribute!")
+                    final_test_suite.errors -= 1
+
+                if loaded_testcase.failure and not existing_tc.failure:
+                    logging.debug("Increase failures attribute!")
+                    final_test_suite.failures += 1
+                elif not loaded_testcase.failure and existing_tc.failure:
+                    logging.debug("Decrease failures attribute!")
+                    final_test_suite.failures -= 1
+
+                if loaded_testcase.skipped and not existing_tc.skipped:
+                    logging.debug("Increase skipped attribute!")
+                    final_test_suite.skipped += 1
+                elif not loaded_testcase.skipped and existing_tc.skipped:
+                    logging.debug("Decrease skipped attribute!")
+                    final_test_suite.skipped -= 1
+
+                if isinstance(existing_tc, CaseTally) or isinstance(
+                    loaded_testcase, CaseTally
+                ):
+                    final_test_suite.test_cases[existing_tc_index] = (
+                        loaded_testcase
+                    )
+                else:
                     existing_tc.time = loaded_testcase.time
                     existing_tc.error = loaded_testcase.error
                     existing_tc.failure = loaded_testcase.failure
                     existing_tc.skipped = loaded_testcase.skipped
-                else:
-                    logging.debug("Test suite timestamp is NOT updated!")
             else:
-                logging.debug("Test case NOT found!")
-                if loaded_testcase.error:
-                    final_test_suite.errors += 1
-                if loaded_testcase.failure:
-                    final_test_suite.failures += 1
-                if loaded_testcase.skipped:
-                    final_test_suite.skipped += 1
-                final_test_suite.tests += 1
-                final_test_suite.test_cases.append(loaded_testcase)
-
-    return final_test_suite
-
-
-def create_junit_file(test_suite: TestSuite) -> None:
+                logging.debug("Existing test case wins!")
+        else:
+            logging.debug("Test case NOT found!")
+            if loaded_testcase.error:
+                final_test_suite.errors += 1
+            if loaded_testcase.failure:
+                final_test_suite.failures += 1
+            if loaded_testcase.skipped:
+                final_test_suite.skipped += 1
+            final_test_suite.tests += 1
+            test_case_index[test_case_key] = len(final_test_suite.test_cases)
+            final_test_suite.test_cases.append(loaded_testcase)
+
+
+def build_test_suite_attributes(test_suite: TestSuite) -> dict[str, str]:
+    """Return the attributes of the testsuite element of a test suite"""
+    return {
+        "name": test_suite.name,
+        "errors": str(test_suite.errors),
+        "failures": str(test_suite.failures),
+        "skipped": str(test_suite.skipped),
+        "tests": str(test_suite.tests),
+        "time": str(test_suite.time),
+        "timestamp": str(test_suite.timestamp),
+        "hostname": test_suite.hostname,
+    }
+
+
+def build_test_case_elem(test_case: TestCase) -> etree._Element:
+    """Create the testcase element of a test case"""
+    test_case_elem = etree.Element("testcase")
+    test_case_elem.set("classname", test_case.classname)
+    test_case_elem.set("name", test_case.name)
+
+    if test_case.file is not None:
+        test_case_elem.set("file", test_case.file)
+
+    if test_case.line is not None:
+        test_case_elem.set("line", test_case.line)
+
+    test_case_elem.set("time", str(test_case.time))
+
+    if test_case.error is not None:
+        tc_error: Optional[Error] = test_case.error
+        error_elem = etree.SubElement(test_case_elem, "error")
+        if tc_error.message:
+            error_elem.set("message", tc_error.message)
+        if tc_error.text:
+            error_elem.text = tc_error.text
+
+    if test_case.failure is not None:
+        tc_failure: Optional[Failure] = test_case.failure
+        failure_elem = etree.SubElement(test_case_elem, "failure")
+        if tc_failure.message:
+            failure_elem.set("message", tc_failure.message)
+        if tc_failure.text:
+            failure_elem.text = tc_failure.text
+
+    if test_case.skipped is not None:
+        tc_skipped: Optional[Skipped] = test_case.skipped
+        skipped_elem = etree.SubElement(test_case_elem, "skipped")
+        if tc_skipped.type:
+            skipped_elem.set("type", tc_skipped.type)
+        if tc_skipped.message:
+            skipped_elem.set("message", tc_skipped.message)
+        if tc_skipped.text:
+            skipped_elem.text = tc_skipped.text
+
+    return test_case_elem
+
+
+def create_junit_file(
+    test_suite: TestSuite, file_path: Union[str, BinaryIO] = "junit.xml"
+) -> None:
+    """Write the junit.xml file of a test suite to a path or binary file"""
     logging.info("Create junit.xml file")
     root = etree.Element("testsuites")
 
@@ -275,64 +641,188 @@ def create_junit_file(test_suite: TestSuite) -> None:
     test_suite_elem = etree.SubElement(root, "testsuite")
 
     logging.debug("Add attributes to the testsuite element")
-    test_suite_elem.set("name", test_suite.name)
-    test_suite_elem.set("errors", str(test_suite.errors))
-    test_suite_elem.set("failures", str(test_suite.failures))
-    test_suite_elem.set("skipped", str(test_suite.skipped))
-    test_suite_elem.set("tests", str(test_suite.tests))
-    test_suite_elem.set("time", str(test_suite.time))
-    test_suite_elem.set("timestamp", str(test_suite.timestamp))
-    test_suite_elem.set("hostname", test_suite.hostname)
+    for name, value in build_test_suite_attributes(test_suite).items():
+        test_suite_elem.set(name, value)
 
     for test_case in test_suite.test_cases:
-        test_case_elem = etree.SubElement(test_suite_elem, "testcase")
-        test_case_elem.set("classname", test_case.classname)
-        test_case_elem.set("name", test_case.name)
-
-        if test_case.file is not None:
-            test_case_elem.set("file", test_case.file)
-
-        if test_case.line is not None:
-            test_case_elem.set("line", test_case.line)
-
-        test_case_elem.set("time", str(test_case.time))
-
-        if test_case.error is not None:
-            tc_error: Optional[Error] = test_case.error
-            error_elem = etree.SubElement(test_case_elem, "error")
-            if tc_error.message:
-                error_elem.set("message", tc_error.message)
-            if tc_error.text:
-                error_elem.text = tc_error.text
-
-        if test_case.failure is not None:
-            tc_failure: Optional[Failure] = test_case.failure
-            failure_elem = etree.SubElement(test_case_elem, "failure")
-            if tc_failure.message:
-                failure_elem.set("message", tc_failure.message)
-            if tc_failure.text:
-                failure_elem.text = tc_failure.text
-
-        if test_case.skipped is not None:
-            tc_skipped: Optional[Skipped] = test_case.skipped
-            skipped_elem = etree.SubElement(test_case_elem, "skipped")
-            if tc_skipped.type:
-                skipped_elem.set("type", tc_skipped.type)
-            if tc_skipped.message:
-                skipped_elem.set("message", tc_skipped.message)
-            if tc_skipped.text:
-                skipped_elem.text = tc_skipped.text
+        if not isinstance(test_case, CaseTally):
+            test_suite_elem.append(build_test_case_elem(test_case))
 
     xml_tree = etree.ElementTree(root)
     xml_tree.write(
-        os.path.join(os.getcwd(), "junit.xml"),
+        file_path,
         pretty_print=True,
         xml_declaration=True,
         encoding="utf-8",
     )
 
 
-def merge_junit_files(file_paths: list[str]) -> None:
-    test_suites = parse_junit_xml(file_paths)
-    final_test_suite = merge_test_suites(test_suites)
-    create_junit_file(final_test_suite)
+def create_junit_file_from_stream(
+    test_suite: TestSuite,
+    test_cases: Iterable[Union[TestCase, CaseTally]],
+    file_path: str = "junit.xml",
+) -> None:
+    """Write a junit.xml file while iterating over the test cases
+
+    The attributes come from test_suite, its test_cases list is not used.
+    The output is the same as create_junit_file, but only one test case
+    element exists at a time.
+    """
+    logging.info("Create junit.xml file from a stream of test cases")
+    test_cases = (
+        test_case
+        for test_case in test_cases
+        if not isinstance(test_case, CaseTally)
+    )
+    first_test_case = next(test_cases, None)
+    if first_test_case is None:
+        create_junit_file(test_suite, file_path)
+        return
+    test_cases = chain([first_test_case], test_cases)
+
+    with open(file_path, "wb") as junit_xml:
+        junit_xml.write(b"<?xml version='1.0' encoding='UTF-8'?>\n")
+        with etree.xmlfile(junit_xml, encoding="utf-8") as xf:
+            with xf.element("testsuites"):
+                xf.write("\n  ")
+                with xf.element(
+                    "testsuite", build_test_suite_attributes(test_suite)
+                ):
+                    for test_case in test_cases:
+                        xf.write("\n    ")
+                        test_case_elem = build_test_case_elem(test_case)
+                        etree.indent(test_case_elem, space="  ", level=2)
+                        xf.write(test_case_elem)
+                    xf.write("\n  ")
+                xf.write("\n")
+        junit_xml.write(b"\n")
+
+
+def merge_junit_files_external(
+    file_paths: list[str],
+    file_path: str = "junit.xml",
+    memory_limit: int = 256 * 1024 * 1024,
+    temp_dir: Optional[str] = None,
+    key: KeyFunction = classname_name_key,
+    policy: ResolutionPolicy = latest_wins,
+    case_filter: Optional[CaseFilter] = None,
+    use_mmap: bool = False,
+) -> None:
+    """Merge junit XML files into one without keeping them in memory
+
+    The output is the same as the in-memory merge. The test cases are
+    streamed from the inputs into runs sorted by their key, which are
+    spilled to temporary files whenever memory_limit bytes are buffered. A
+    k-way merge of the runs resolves the duplicates, and the merged test cases
+    are sorted back to their first position and streamed into the output.
+    The two sorts share memory_limit, half each.
+    With case_filter only tallies of the rejected test cases are spilled.
+    With use_mmap the inputs are streamed through a memory map.
+    """
+    logging.info("Merge junit XML files with external sorting")
+    final_test_suite = TestSuite()
+    position = 0
+
+    # The buffer of by_key can still be alive while by_position fills up
+    with SpillSorter(
+        itemgetter(0, 1), memory_limit // 2, temp_dir
+    ) as by_key, SpillSorter(
+        itemgetter(0), memory_limit // 2, temp_dir
+    ) as by_position:
+        for input_path in file_paths:
+            logging.debug(f"Spill test cases of {input_path}")
+            for elem in iterparse_junit_xml(input_path, use_mmap):
+                if elem.tag == "testsuite":
+                    test_suite = parse_test_suite_elem(elem)
+                    is_test_suite_timestamp_updated = (
+                        fold_test_suite_attributes(
+                            final_test_suite, test_suite
+                        )
+                    )
+                    continue
+
+                if case_filter is not None:
+                    test_case = select_test_case_elem(elem, case_filter)
+                else:
+                    test_case = parse_test_case_elem(elem)
+                by_key.add(
+                    (
+                        key(test_case, test_suite),
+                        position,
+                        is_test_suite_timestamp_updated,
+                        test_case,
+                    )
+                )
+                position += 1
+
+        logging.debug("Resolve duplicated test cases")
+        for _, records in groupby(by_key.sorted_records(), itemgetter(0)):
+            _, first_position, _, test_case = next(records)
+            for _, _, is_updated, loaded_testcase in records:
+                if not policy(test_case, loaded_testcase, is_updated):
+                    continue
+                if isinstance(test_case, CaseTally) or isinstance(
+                    loaded_testcase, CaseTally
+                ):
+                    test_case = loaded_testcase
+                else:
+                    test_case.time = loaded_testcase.time
+                    test_case.error = loaded_testcase.error
+                    test_case.failure = loaded_testcase.failure
+                    test_case.skipped = loaded_testcase.skipped
+
+            if test_case.error:
+                final_test_suite.errors += 1
+            if test_case.failure:
+                final_test_suite.failures += 1
+            if test_case.skipped:
+                final_test_suite.skipped += 1
+            final_test_suite.tests += 1
+            if not isinstance(test_case, CaseTally):
+                by_position.add((first_position, test_case))
+        by_key.close()
+
+        create_junit_file_from_stream(
+            final_test_suite,
+            (test_case for _, test_case in by_position.sorted_records()),
+            file_path,
+        )
+
+
+def merge_junit_files(
+    file_paths: list[str],
+    file_path: str = "junit.xml",
+    use_mmap: bool = False,
+    memory_limit: Optional[int] = None,
+    key: KeyFunction = classname_name_key,
+    policy: ResolutionPolicy = latest_wins,
+    case_filter: Optional[CaseFilter] = None,
+) -> None:
+    """Merge junit XML files into one junit.xml file
+
+    With memory_limit the files are merged by merge_junit_files_external.
+    With case_filter only the selected test cases are written, but the
+    counters of the test suite count every test case.
+    """
+    if memory_limit is not None:
+        merge_junit_files_external(
+            file_paths,
+            file_path,
+            memory_limit,
+            key=key,
+            policy=policy,
+            case_filter=case_filter,
+            use_mmap=use_mmap,
+        )
+        return
+
+    logging.info("Let's merge test suites!")
+    final_test_suite = TestSuite()
+    for input_path in file_paths:
+        # Fold each file once parsed, its test cases are not kept around
+        test_suites = parse_junit_xml([input_path], use_mmap, case_filter)
+        for test_suite in test_suites.test_suites:
+            fold_test_suite(final_test_suite, test_suite, key, policy)
+
+    drop_case_tallies(final_test_suite)
+    create_junit_file(final_test_suite, file_path)
@@ -0,0 +1,42 @@
+from contextlib import contextmanager
+from lxml import etree
+from typing import BinaryIO, Iterator, Optional
+import io
+import mmap
+import os
+
+# Size of the slices fed to the lxml parser, only one slice is copied out of
+# the memory map at a time.
+MMAP_CHUNK_SIZE = 1024 * 1024
+
+
+def parse_mmap(
+    file_path: str, parser: etree._FeedParser
+) -> Optional[etree._Element]:
+    """Parse a file through a read-only memory map and return the root
+
+    The mapped pages are fed to the lxml parser in slices, so the file is
+    never read or decoded into a Python string as a whole.
+    """
+    with open(file_path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size > 0:
+            with mmap.mmap(
+                fp.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped_file:
+                for offset in range(0, len(mapped_file), MMAP_CHUNK_SIZE):
+                    parser.feed(
+                        mapped_file[offset : offset + MMAP_CHUNK_SIZE]
+                    )
+    return parser.close()
+
+
+@contextmanager
+def open_mmap(file_path: str) -> Iterator[BinaryIO]:
+    """Open a file as a read-only memory map, usable as a file object"""
+    with open(file_path, "rb") as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            yield io.BytesIO()
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
@@ -0,0 +1,114 @@
+"""Identity keys and duplicate resolution policies of the merges
+
+A key function returns the identity of a test case (junit) or test result
+(report.html) within the test suite or test run summary it was loaded from.
+It is computed once per loaded test and looked up in a dict, so keys must be
+hashable, and sortable for merge_junit_files_external.
+
+A resolution policy decides whether a loaded test replaces the already
+merged test with the same key. It gets the existing and the loaded test, and
+whether the suite or run of the loaded test has the latest timestamp so far.
+"""
+
+from typing import Any, Callable, Hashable
+
+KeyFunction = Callable[[Any, Any], Hashable]
+ResolutionPolicy = Callable[[Any, Any, bool], bool]
+
+# From best to worst, junit and report.html outcomes together
+OUTCOME_SEVERITY = {
+    "passed": 0,
+    "xfailed": 1,
+    "skipped": 2,
+    "rerun": 3,
+    "xpassed": 4,
+    "failed": 5,
+    "failure": 5,
+    "error": 6,
+}
+
+
+def outcome(test: Any) -> str:
+    """Return the lowercase outcome of a junit test case or a test result"""
+    if hasattr(test, "result"):
+        return test.result.lower()
+    if test.error:
+        return "error"
+    if test.failure:
+        return "failure"
+    if test.skipped:
+        return "skipped"
+    return "passed"
+
+
+def duration(test: Any) -> float:
+    """Return the duration of a junit test case or a test result"""
+    if hasattr(test, "duration"):
+        try:
+            return float(test.duration)
+        except (TypeError, ValueError):
+            return 0.0
+    return test.time
+
+
+def classname_name_key(test_case: Any, test_suite: Any) -> Hashable:
+    """The default junit identity: classname and name"""
+    return (test_case.classname, test_case.name)
+
+
+def file_key(test_case: Any, test_suite: Any) -> Hashable:
+    """Tell apart the test cases with the same name in different files"""
+    return (test_case.file or "", test_case.classname, test_case.name)
+
+
+def suite_key(test_case: Any, test_suite: Any) -> Hashable:
+    """Tell apart the test cases with the same name in different suites"""
+    return (test_suite.name, test_case.classname, test_case.name)
+
+
+def unparametrized_key(test_case: Any, test_suite: Any) -> Hashable:
+    """Merge all the parametrizations of a test case into one"""
+    return (test_case.classname, test_case.name.split("[", 1)[0])
+
+
+def node_id_key(test_result: Any, test_run_summary: Any) -> Hashable:
+    """The default report.html identity: the test node id"""
+    return test_result.test
+
+
+def unparametrized_node_id_key(
+    test_result: Any, test_run_summary: Any
+) -> Hashable:
+    """Merge all the parametrizations of a test result into one"""
+    return test_result.test.split("[", 1)[0]
+
+
+def latest_wins(existing: Any, loaded: Any, is_latest: bool) -> bool:
+    """The default policy: the test of the latest suite or run wins"""
+    return is_latest
+
+
+def worst_outcome_wins(existing: Any, loaded: Any, is_latest: bool) -> bool:
+    existing_severity = OUTCOME_SEVERITY.get(outcome(existing), 0)
+    loaded_severity = OUTCOME_SEVERITY.get(outcome(loaded), 0)
+    return loaded_severity > existing_severity or (
+        loaded_severity == existing_severity and is_latest
+    )
+
+
+def best_outcome_wins(existing: Any, loaded: Any, is_latest: bool) -> bool:
+    existing_severity = OUTCOME_SEVERITY.get(outcome(existing), 0)
+    loaded_severity = OUTCOME_SEVERITY.get(outcome(loaded), 0)
+    return loaded_severity < existing_severity or (
+        loaded_severity == existing_severity and is_latest
+    )
+
+
+def longest_wins(existing: Any, loaded: Any, is_latest: bool) -> bool:
+    return duration(loaded) > duration(existing)
+
+
+# The policies that only look at the outcome of the tests
+OUTCOME_POLICIES = frozenset(
+    (latest_wins, worst_outcome_wins, best_outcome_wins)
+)
@@ -1,9 +1,24 @@
+from lxml import html
 from parsel import Selector
 import logging
 from datetime import datetime
+from typing import Hashable, Optional, TextIO
 import os
 
 from onefile import init_onefile
+from onefile.attributes import (
+    format_report_timestamp,
+    is_latest_timestamp,
+    parse_leading_int,
+    parse_report_timestamp,
+)
+from onefile.mmap_reader import parse_mmap
+from onefile.policies import (
+    KeyFunction,
+    ResolutionPolicy,
+    latest_wins,
+    node_id_key,
+)
 
 init_onefile()
 
@@ -55,6 +70,8 @@ class TestRunSummary:
         self.total_xpassed_tests = total_xpassed_tests
         self.total_rerun = total_rerun
         self.test_results: list[TestResult] = []
+        # Merge key -> index in test_results, maintained by fold_test_run
+        self.test_result_index: dict[Hashable, int] = {}
 
     def add_test_result(self, test_result: TestResult) -> None:
         self.test_results.append(test_result)
@@ -89,229 +106,280 @@ class TestRunSummeries:
         )
 
 
-def parse_report_html_files(file_paths: list[str]) -> TestRunSummeries:
+SPAN_CLASSES_TO_ATTRIBUTES = {
+    "passed": "total_passed_tests",
+    "skipped": "total_skipped_tests",
+    "failed": "total_failed_tests",
+    "error": "total_errors",
+    "xfailed": "total_xfail_tests",
+    "xpassed": "total_xpassed_tests",
+    "rerun": "total_rerun",
+}
+
+
+def parse_report_html_selector(selector: Selector) -> TestRunSummary:
+    """Create a TestRunSummary from a parsed report.html file"""
+    logging.debug("Parse test run summary")
+    date_time_str = selector.xpath(
+        "normalize-space(substring-before(substring-after(//p/text(), "
+        '"Report generated on "), " by"))'
+    ).get()
+    summary_words = (
+        selector.xpath(
+            "//h2[text()='Summary']/following-sibling::p[1]/text()"
+        )
+        .get()
+        .split(" ")
+    )
+    counters = {}
+    for span in selector.xpath("//span[@class]"):
+        attr_name = SPAN_CLASSES_TO_ATTRIBUTES.get(span.attrib["class"])
+        if attr_name is not None and attr_name not in counters:
+            counters[attr_name] = parse_leading_int(
+                span.xpath("text()").get()
+            )
+
+    test_run_summary = TestRunSummary(
+        pytest_html_version=str(
+            selector.xpath(
+                '//p[contains(text(), "Report generated")]/a/following-sibling::text()'
+            ).get()
+        ),
+        timestamp=parse_report_timestamp(date_time_str),
+        total_tests=int(summary_words[0]),
+        total_test_run_time=float(summary_words[4]),
+        **counters,
+    )
+
+    logging.debug("Parse test results")
+    for result_table_row in selector.css("tbody.results-table-row"):
+        test_result = TestResult(
+            result=result_table_row.css("td.col-result::text").get(),
+            test=result_table_row.css("td.col-name::text").get(),
+            duration=result_table_row.css("td.col-duration::text").get(),
+            log_msg=result_table_row.css("div.log::text").get(),
+        )
+        test_run_summary.add_test_result(test_result)
+
+    return test_run_summary
+
+
+def parse_report_html_files(
+    file_paths: list[str], use_mmap: bool = False
+) -> TestRunSummeries:
+    """Parse report.html files into classes
+
+    With use_mmap the files are fed to lxml through a memory map, without
+    decoding them into a Python string first, see onefile.mmap_reader.
+    """
     logging.info("Parse report.html files into classes")
     test_run_summaries = TestRunSummeries()
 
     for file_path in file_paths:
-        with open(file_path) as fp:
-            html_text = fp.read()
-        selector = Selector(text=html_text)
-
-        logging.debug("Parse test run summary")
-        date_time_str = selector.xpath(
-            "normalize-space(substring-before(substring-after(//p/text(), "
-            '"Report generated on "), " by"))'
-        ).get()
-        date_time_format = "%d-%b-%Y at %H:%M:%S"
-
-        test_run_summary = TestRunSummary(
-            pytest_html_version=str(
-                selector.xpath(
-                    '//p[contains(text(), "Report generated")]/a/following-sibling::text()'
-                ).get()
-            ),
-            timestamp=datetime.strptime(date_time_str, date_time_format),
-            total_tests=int(
-                selector.xpath(
-                    "//h2[text()='Summary']/following-sibling::p[1]/text()"
-                )
-                .get()
-                .split(" ")[0]
-            ),
-            total_test_run_time=float(
-                selector.xpath(
-                    "//h2[text()='Summary']/following-sibling::p[1]/text()"
-                )
-                .get()
-                .split(" ")[4]
-            ),
-            total_passed_tests=int(
-                selector.css("span.passed::text").get().split(" ")[0]
-            ),
-            total_skipped_tests=int(
-                selector.css("span.skipped::text").get().split(" ")[0]
-            ),
-            total_failed_tests=int(
-                selector.css("span.failed::text").get().split(" ")[0]
-            ),
-            total_errors=int(
-                selector.css("span.error::text").get().split(" ")[0]
-            ),
-            total_xfail_tests=int(
-                selector.css("span.xfailed::text").get().split(" ")[0]
-            ),
-            total_xpassed_tests=int(
-                selector.css("span.xpassed::text").get().split(" ")[0]
-            ),
-            total_rerun=int(
-                selector.css("span.rerun::text").get().split(" ")[0]
-            ),
-        )
-
-        logging.debug("Parse test results")
-        for result_table_row in selector.css("tbody.results-table-row"):
-            test_result = TestResult(
-                result=result_table_row.css("td.col-result::text").get(),
-                test=result_table_row.css("td.col-name::text").get(),
-                duration=result_table_row.css("td.col-duration::text").get(),
-                log_msg=result_table_row.css("div.log::text").get(),
+        if use_mmap:
+            root = parse_mmap(
+                file_path,
+                html.HTMLParser(
+                    recover=True, encoding="utf-8", huge_tree=True
+                ),
             )
-            test_run_summary.add_test_result(test_result)
-
+            if root is None:
+                root = html.fromstring("<html/>")
+            selector = Selector(root=root, type="html")
+        else:
+            with open(file_path) as fp:
+                html_text = fp.read()
+            selector = Selector(text=html_text)
+
+        test_run_summary = parse_report_html_selector(selector)
         test_run_summaries.add_test_run_summary(test_run_summary)
 
     return test_run_summaries
 
 
-def merge_test_runs(test_run_summaries: TestRunSummeries) -> TestRunSummary:
+def merge_test_runs(
+    test_run_summaries: TestRunSummeries,
+    key: KeyFunction = node_id_key,
+    policy: ResolutionPolicy = latest_wins,
+) -> TestRunSummary:
     logging.info("Merge test run summaries")
     final_test_run_summary = TestRunSummary()
 
     for test_run_summary in test_run_summaries.test_run_summaries:
-        final_test_run_summary.pytest_html_version = (
-            test_run_summary.pytest_html_version
-        )
+        fold_test_run(final_test_run_summary, test_run_summary, key, policy)
 
-        logging.debug("Sum all the test suite time")
-        final_test_run_summary.total_test_run_time += (
-            test_run_summary.total_test_run_time
-        )
+    return final_test_run_summary
 
-        logging.debug("Find the latest timestamp")
-        is_timestamp_updated = False
-        if (
-            final_test_run_summary.timestamp is None
-            or test_run_summary.timestamp > final_test_run_summary.timestamp
-        ):
-            final_test_run_summary.timestamp = test_run_summary.timestamp
-            is_timestamp_updated = True
-
-        for test_result in test_run_summary.test_results:
-            logging.debug(f"Loaded TestResult: {test_result}")
-            existing_tr_index = next(
-                (
-                    index
-                    for index, tr in enumerate(
-                        final_test_run_summary.test_results
-                    )
-                    if tr.test == test_result.test
-                ),
-                None,
-            )
 
-            if existing_tr_index is not None:
-                logging.debug("Test result found!")
-                if is_timestamp_updated:
-                    logging.debug("Test run timestamp is updated!")
-                    logging.debug(
-                        "Update final test run errors, failures, skipped"
-                    )
-                    existing_tr = final_test_run_summary.test_results[
-                        existing_tr_index
-                    ]
-
-                    result_mapping = {
-                        "Passed": (
-                            "total_passed_tests",
-                            "Increase Passed attribute!",
-                            "Decrease Passed attribute!",
-                        ),
-                        "Failed": (
-                            "total_failed_tests",
-                            "Increase Failed attribute!",
-                            "Decrease Failed attribute!",
-                        ),
-                        "Error": (
-                            "total_errors",
-                            "Increase Error attribute!",
-                            "Decrease Error attribute!",
-                        ),
-                        "XFailed": (
-                            "total_xfail_tests",
-                            "Increase XFailed attribute!",
-                            "Decrease XFailed attribute!",
-                        ),
-                        "XPassed": (
-                            "total_xpassed_tests",
-                            "Increase XPassed attribute!",
-                            "Decrease XPassed attribute!",
-                        ),
-                        "Skipped": (
-                            "total_skipped_tests",
-                            "Increase Skipped attribute!",
-                            "Decrease Skipped attribute!",
-                        ),
-                        "Rerun": (
-                            "total_rerun",
-                            "Increase Rerun attribute!",
-                            "Decrease Rerun attribute!",
-                        ),
-                    }
-
-                    for result_type, (
-                        attr_name,
-                        inc_msg,
-                        dec_msg,
-                    ) in result_mapping.items():
-
-                        if (
-                            test_result.result == result_type
-                            and existing_tr.result != result_type
-                        ):
-                            logging.debug(inc_msg)
-                            setattr(
-                                final_test_run_summary,
-                                attr_name,
-                                getattr(final_test_run_summary, attr_name) + 1,
-                            )
-                        elif (
-                            test_result.result != result_type
-                            and existing_tr.result == result_type
-                        ):
-                            logging.debug(dec_msg)
-                            setattr(
-                                final_test_run_summary,
-                                attr_name,
-                                getattr(final_test_run_summary, attr_name) - 1,
-                            )
-                else:
-                    logging.debug("Test suite timestamp is NOT updated!")
-            else:
-                logging.debug("Test result NOT found!")
-                results_to_attributes = {
-                    "Passed": "total_passed_tests",
-                    "Failed": "total_failed_tests",
-                    "Skipped": "total_skipped_tests",
-                    "XFailed": "total_xfail_tests",
-                    "XPassed": "total_xpassed_tests",
-                    "Error": "total_errors",
-                    "Rerun": "total_rerun",
+def fold_test_run(
+    final_test_run_summary: TestRunSummary,
+    test_run_summary: TestRunSummary,
+    key: KeyFunction = node_id_key,
+    policy: ResolutionPolicy = latest_wins,
+) -> None:
+    """Merge one test run summary into an already merged one in place
+
+    The test results are identified by key and the duplicates are resolved
+    by policy, see onefile.policies.
+    """
+    final_test_run_summary.pytest_html_version = (
+        test_run_summary.pytest_html_version
+    )
+
+    logging.debug("Sum all the test suite time")
+    final_test_run_summary.total_test_run_time += (
+        test_run_summary.total_test_run_time
+    )
+
+    logging.debug("Find the latest timestamp")
+    is_timestamp_updated = False
+    if is_latest_timestamp(
+        test_run_summary.timestamp, final_test_run_summary.timestamp
+    ):
+        final_test_run_summary.timestamp = test_run_summary.timestamp
+        is_timestamp_updated = True
+
+    test_result_index = final_test_run_summary.test_result_index
+
+    for test_result in test_run_summary.test_results:
+        logging.debug("Loaded TestResult: %s", test_result)
+        test_result_key = key(test_result, test_run_summary)
+        existing_tr_index = test_result_index.get(test_result_key)
+
+        if existing_tr_index is not None:
+            logging.debug("Test result found!")
+            existing_tr = final_test_run_summary.test_results[
+                existing_tr_index
+            ]
+            if policy(existing_tr, test_result, is_timestamp_updated):
+                logging.debug("Loaded test result wins!")
+                logging.debug(
+                    "Update final test run errors, failures, skipped"
+                )
+
+                result_mapping = {
+                    "Passed": (
+                        "total_passed_tests",
+                        "Increase Passed attribute!",
+                        "Decrease Passed attribute!",
+                    ),
+                    "Failed": (
+                        "total_failed_tests",
+                        "Increase Failed attribute!",
+                        "Decrease Failed attribute!",
+                    ),
+                    "Error": (
+                        "total_errors",
+                        "Increase Error attribute!",
+                        "Decrease Error attribute!",
+                    ),
+                    "XFailed": (
+                        "total_xfail_tests",
+                        "Increase XFailed attribute!",
+                        "Decrease XFailed attribute!",
+                    ),
+                    "XPassed": (
+                        "total_xpassed_tests",
+                        "Increase XPassed attribute!",
+                        "Decrease XPassed attribute!",
+                    ),
+                    "Skipped": (
+                        "total_skipped_tests",
+                        "Increase Skipped attribute!",
+                        "Decrease Skipped attribute!",
+                    ),
+                    "Rerun": (
+                        "total_rerun",
+                        "Increase Rerun attribute!",
+                        "Decrease Rerun attribute!",
+                    ),
                 }
 
-                attribute_name = results_to_attributes.get(test_result.result)
-                if attribute_name:
-                    setattr(
-                        final_test_run_summary,
-                        attribute_name,
-                        getattr(final_test_run_summary, attribute_name) + 1,
-                    )
-                final_test_run_summary.total_tests += 1
+                for result_type, (
+                    attr_name,
+                    inc_msg,
+                    dec_msg,
+                ) in result_mapping.items():
+
+                    if (
+                        test_result.result == result_type
+                        and existing_tr.result != result_type
+                    ):
+                        logging.debug(inc_msg)
+                        setattr(
+                            final_test_run_summary,
+                            attr_name,
+                            getattr(final_test_run_summary, attr_name) + 1,
+                        )
+                    elif (
+                        test_result.result != result_type
+                        and existing_tr.result == result_type
+                    ):
+                        logging.debug(dec_msg)
+                        setattr(
+                            final_test_run_summary,
+                            attr_name,
+                            getattr(final_test_run_summary, attr_name) - 1,
+                        )
+
+                existing_tr.result = test_result.result
+                existing_tr.duration = test_result.duration
+                existing_tr.log_msg = test_result.log_msg
+            else:
+                logging.debug("Existing test result wins!")
+        else:
+            logging.debug("Test result NOT found!")
+            results_to_attributes = {
+                "Passed": "total_passed_tests",
+                "Failed": "total_failed_tests",
+                "Skipped": "total_skipped_tests",
+                "XFailed": "total_xfail_tests",
+                "XPassed": "total_xpassed_tests",
+                "Error": "total_errors",
+                "Rerun": "total_rerun",
+            }
+
+            attribute_name = results_to_attributes.get(test_result.result)
+            if attribute_name:
+                setattr(
+                    final_test_run_summary,
+                    attribute_name,
+                    getattr(final_test_run_summary, attribute_name) + 1,
+                )
+            final_test_run_summary.total_tests += 1
 
-                final_test_run_summary.add_test_result(test_result)
+            test_result_index[test_result_key] = len(
+                final_test_run_summary.test_results
+            )
+            final_test_run_summary.add_test_result(test_result)
 
-    return final_test_run_summary
+
+RESULTS_TABLE_HEAD = """
+        <h2>Results</h2>
+        <table id="results-table">
+        <thead id="results-table-head">
+            <tr>
+                <th class="sortable result initial-sort" col="result">Result</th>
+                <th class="sortable" col="name">Test</th>
+                <th class="sortable" col="duration">Duration</th>
+                <th class="sortable links" col="links">Links</th></tr>
+            <tr hidden="true" id="not-found-message">
+                <th colspan="4">No results found. Try to check the filters</th></tr></thead>
+    """
+
+POST_TEXT = """</table></body></html>"""
 
 
-def create_report_html_file(test_run_summary: TestRunSummary) -> None:
-    template_text = ""
+def read_template() -> str:
     with open(
         os.path.join(os.path.dirname(__file__), "template.html")
     ) as template_f:
-        template_text = template_f.read()
+        return template_f.read()
+
 
-    pre_text = f"""
-        <p>Report generated on {test_run_summary.timestamp} by <a href="https://pypi.python.org/pypi/pytest-html">pytest-html</a>{test_run_summary.pytest_html_version}</p>
+def summary_html(test_run_summary: TestRunSummary) -> str:
+    return f"""
+        <p>Report generated on {format_report_timestamp(test_run_summary.timestamp)} by <a href="https://pypi.python.org/pypi/pytest-html">pytest-html</a>{test_run_summary.pytest_html_version}</p>
         <h2>Summary</h2>
         <p>{test_run_summary.total_tests} tests ran in {test_run_summary.total_test_run_time} seconds. </p>
         <p class="filter" hidden="true">(Un)check the boxes to filter the results.</p>
@@ -329,23 +397,11 @@ def create_report_html_file(test_run_summary: TestRunSummary) -> None:
         <span class="xpassed">{test_run_summary.total_xpassed_tests} unexpected passes</span>, 
         <input checked="true" class="filter" data-test-result="rerun" {'disabled="true"' if test_run_summary.total_rerun == 0 else ""} hidden="true" name="filter_checkbox" onChange="filterTable(this)" type="checkbox"/>
         <span class="rerun">{test_run_summary.total_rerun} rerun</span>
-        <h2>Results</h2>
-        <table id="results-table">
-        <thead id="results-table-head">
-            <tr>
-                <th class="sortable result initial-sort" col="result">Result</th>
-                <th class="sortable" col="name">Test</th>
-                <th class="sortable" col="duration">Duration</th>
-                <th class="sortable links" col="links">Links</th></tr>
-            <tr hidden="true" id="not-found-message">
-                <th colspan="4">No results found. Try to check the filters</th></tr></thead>
     """
-    logging.debug("Pre text:" + pre_text)
 
-    tbodies = ""
 
-    for test_result in test_run_summary.test_results:
-        tbodies += f"""
+def result_row_html(test_result: TestResult) -> str:
+    return f"""
             <tbody class="{test_result.result.lower()} results-table-row">
             <tr>
                 <td class="col-result">{test_result.result}</td>
@@ -356,17 +412,138 @@ def create_report_html_file(test_run_summary: TestRunSummary) -> None:
                 <td class="extra" colspan="4">
                 <div class="empty log">{test_result.log_msg}</div></td></tr></tbody>
         """
-    logging.debug("tbodies: " + tbodies)
 
-    post_text = """</table></body></html>"""
 
-    final_html_text = template_text + pre_text + tbodies + post_text
+def page_file_path(file_path: str, page_number: int) -> str:
+    """Return the path of the given (1-based) page of a paginated report"""
+    root, ext = os.path.splitext(file_path)
+    return f"{root}_page_{page_number}{ext}"
 
-    with open("report.html", "w") as report_html:
-        report_html.write(final_html_text)
 
+def create_report_html_file(
+    test_run_summary: TestRunSummary,
+    file_path: str = "report.html",
+    page_size: Optional[int] = None,
+) -> None:
+    """Write the report.html file of a test run summary
 
-def merge_report_html_files(file_paths: list[str]) -> None:
-    test_run_summaries = parse_report_html_files(file_paths)
-    test_run_summary = merge_test_runs(test_run_summaries)
-    create_report_html_file(test_run_summary)
+    When page_size is given, file_path becomes an index page with the summary
+    counters and links to the page files, and the result rows are streamed
+    into page files of at most page_size rows each, next to the index page.
+    """
+    if page_size is not None:
+        create_paginated_report_html_files(
+            test_run_summary, file_path, page_size
+        )
+        return
+
+    with open(file_path, "w") as report_html:
+        write_report_html(test_run_summary, report_html)
+
+
+def write_report_html(
+    test_run_summary: TestRunSummary, report_html: TextIO
+) -> None:
+    """Write a single page report.html into an open text file"""
+    template_text = read_template()
+    pre_text = summary_html(test_run_summary) + RESULTS_TABLE_HEAD
+    logging.debug("Pre text:" + pre_text)
+
+    report_html.write(template_text + pre_text)
+    for test_result in test_run_summary.test_results:
+        report_html.write(result_row_html(test_result))
+    report_html.write(POST_TEXT)
+
+
+def create_paginated_report_html_files(
+    test_run_summary: TestRunSummary,
+    file_path: str = "report.html",
+    page_size: int = 1000,
+) -> None:
+    """Write an index page and page files of at most page_size result rows
+
+    The page files left over by an earlier report with more pages are
+    removed.
+    """
+    if page_size < 1:
+        raise ValueError(f"page_size must be positive, got {page_size}")
+
+    template_text = read_template()
+    total_results = len(test_run_summary.test_results)
+    page_count = max(1, -(-total_results // page_size))
+    index_name = os.path.basename(file_path)
+    logging.info(
+        f"Create paginated report: {total_results} results "
+        f"in {page_count} pages"
+    )
+
+    page_links = ""
+    for page_number in range(1, page_count + 1):
+        first = (page_number - 1) * page_size + 1
+        last = min(page_number * page_size, total_results)
+        page_name = os.path.basename(page_file_path(file_path, page_number))
+        results_range = (
+            f" (results {first}-{last})" if total_results else " (no results)"
+        )
+        page_links += f"""
+            <li><a href="{page_name}">Page {page_number}</a>{results_range}</li>"""
+
+    with open(file_path, "w") as index_html:
+        index_html.write(template_text + summary_html(test_run_summary))
+        index_html.write(
+            f"""
+        <h2>Pages</h2>
+        <ul class="pages">{page_links}
+        </ul>
+    """
+        )
+        index_html.write(RESULTS_TABLE_HEAD + POST_TEXT)
+
+    test_results = iter(test_run_summary.test_results)
+    for page_number in range(1, page_count + 1):
+        logging.debug(f"Write page {page_number} of {page_count}")
+        nav = f'<a href="{index_name}">Summary</a>'
+        if page_number > 1:
+            previous_name = os.path.basename(
+                page_file_path(file_path, page_number - 1)
+            )
+            nav += f' | <a href="{previous_name}">Previous</a>'
+        if page_number < page_count:
+            next_name = os.path.basename(
+                page_file_path(file_path, page_number + 1)
+            )
+            nav += f' | <a href="{next_name}">Next</a>'
+
+        with open(page_file_path(file_path, page_number), "w") as page_html:
+            page_html.write(
+                template_text
+                + f"""
+        <p class="page-nav">Page {page_number} of {page_count}: {nav}</p>
+    """
+                + RESULTS_TABLE_HEAD
+            )
+            for _ in range(page_size):
+                test_result = next(test_results, None)
+                if test_result is None:
+                    break
+                page_html.write(result_row_html(test_result))
+            page_html.write(POST_TEXT)
+
+    stale_page_number = page_count + 1
+    while os.path.exists(page_file_path(file_path, stale_page_number)):
+        logging.debug(f"Remove stale page {stale_page_number}")
+        os.remove(page_file_path(file_path, stale_page_number))
+        stale_page_number += 1
+
+
+def merge_report_html_files(
+    file_paths: list[str],
+    file_path: str = "report.html",
+    page_size: Optional[int] = None,
+    use_mmap: bool = False,
+    key: KeyFunction = node_id_key,
+    policy: ResolutionPolicy = latest_wins,
+) -> None:
+    test_run_summaries = parse_report_html_files(file_paths, use_mmap)
+    test_run_summary = merge_test_runs(test_run_summaries, key, policy)
+    create_report_html_file(test_run_summary, file_path, page_size)
@@ -0,0 +1,374 @@
+from concurrent.futures import ThreadPoolExecutor
+from parsel import Selector
+from typing import Optional
+from urllib.parse import unquote, urlsplit
+import asyncio
+import io
+import json
+import logging
+
+from onefile import init_onefile
+from onefile.junit import (
+    TestSuite,
+    create_junit_file,
+    fold_test_suite,
+    parse_junit_xml,
+)
+from onefile.policies import (
+    ResolutionPolicy,
+    classname_name_key,
+    latest_wins,
+    node_id_key,
+)
+from onefile.report_html import (
+    TestRunSummary,
+    fold_test_run,
+    parse_report_html_selector,
+    write_report_html,
+)
+
+init_onefile()
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Content Too Large",
+    417: "Expectation Failed",
+    431: "Request Header Fields Too Large",
+}
+
+KINDS = ("junit", "html")
+
+
+class RunState:
+    """The merged junit and report.html results of one run"""
+
+    def __init__(self):
+        self.test_suite = TestSuite()
+        self.test_run_summary = TestRunSummary()
+        self.lock = asyncio.Lock()
+        self.uploads = 0
+
+
+class MergeServer:
+    """HTTP service merging the junit.xml and report.html files of runs
+
+    POST /runs/<run>/junit and POST /runs/<run>/html fold the uploaded file
+    into the merge state of the run, GET on the same paths returns the
+    merged file, and DELETE /runs/<run> forgets the run. Connections are
+    kept alive between requests.
+
+    Uploads are parsed concurrently in a pool of max_workers threads, and
+    folded one at a time per run. At most max_pending_uploads bodies are read
+    at once; the other connections wait unread, which pushes back on the
+    clients through TCP flow control.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        max_workers: int = 4,
+        max_pending_uploads: int = 16,
+        max_upload_size: int = 256 * 1024 * 1024,
+        policy: ResolutionPolicy = latest_wins,
+    ):
+        self.host = host
+        self.port = port
+        self.max_workers = max_workers
+        self.max_pending_uploads = max_pending_uploads
+        self.max_upload_size = max_upload_size
+        self.policy = policy
+        self.runs: dict[str, RunState] = {}
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.upload_slots: Optional[asyncio.Semaphore] = None
+        self.server: Optional[asyncio.Server] = None
+
+    async def start(self) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.upload_slots = asyncio.Semaphore(self.max_pending_uploads)
+        self.server = await asyncio.start_server(
+            self.handle_connection, self.host, self.port
+        )
+        # The actual port, when port 0 asked for any free one
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"Merge server listening on {self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        if self.server is None:
+            await self.start()
+        await self.server.serve_forever()
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except ValueError:
+                    # Longer than the limit of the StreamReader
+                    self.write_response(writer, 400, b"Request too long\n")
+                    await writer.drain()
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = (
+                        request_line.decode("latin-1").strip().split(" ")
+                    )
+                except ValueError:
+                    self.write_response(writer, 400, b"Bad request line\n")
+                    await writer.drain()
+                    break
+
+                headers = await self.read_headers(reader)
+                if headers is None:
+                    self.write_response(writer, 431, b"Header too long\n")
+                    await writer.drain()
+                    break
+
+                connection = headers.get("connection", "").lower()
+                keep_alive = (
+                    connection != "close"
+                    if version == "HTTP/1.1"
+                    else connection == "keep-alive"
+                )
+                status, body, content_type, is_body_read = (
+                    await self.handle_request(
+                        method, target, headers, reader, writer
+                    )
+                )
+                keep_alive = keep_alive and is_body_read
+                self.write_response(
+                    writer, status, body, content_type, keep_alive
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            logging.debug("Client disconnected")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def read_headers(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[dict[str, str]]:
+        """Read the header lines, None when one is longer than the limit"""
+        headers = {}
+        while True:
+            try:
+                header_line = await reader.readline()
+            except ValueError:
+                return None
+            if header_line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = header_line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    def write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: bytes,
+        content_type: str = "text/plain; charset=utf-8",
+        keep_alive: bool = False,
+    ) -> None:
+        writer.write(
+            (
+                f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                "\r\n"
+            ).encode("latin-1")
+            + body
+        )
+
+    async def handle_request(
+        self,
+        method: str,
+        target: str,
+        headers: dict[str, str],
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> tuple[int, bytes, str, bool]:
+        """Return the status, body, content type of the response, and
+        whether the request body was fully read"""
+        content_length = headers.get("content-length")
+        is_chunked = "transfer-encoding" in headers
+        has_body = is_chunked or content_length not in (None, "0")
+        parts = [unquote(part) for part in urlsplit(target).path.split("/")]
+
+        if len(parts) == 3 and parts[1] == "runs" and method == "DELETE":
+            is_deleted = self.runs.pop(parts[2], None) is not None
+            status = 200 if is_deleted else 404
+            return status, b"", "text/plain", not has_body
+        if len(parts) != 4 or parts[1] != "runs" or parts[3] not in KINDS:
+            return 404, b"Unknown path\n", "text/plain", not has_body
+        run_id, kind = parts[2], parts[3]
+
+        if method == "GET":
+            run = self.runs.get(run_id)
+            if run is None:
+                return 404, b"Unknown run\n", "text/plain", not has_body
+            body, content_type = await self.render(run, kind)
+            return 200, body, content_type, not has_body
+
+        if method != "POST":
+            return 405, b"Use GET or POST\n", "text/plain", not has_body
+        if content_length is None or is_chunked:
+            # A chunked body is left unread, the connection must be closed
+            body = b"Content-Length required\n"
+            return 411, body, "text/plain", not is_chunked
+        try:
+            length = int(content_length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return 400, b"Bad Content-Length\n", "text/plain", False
+        if length > self.max_upload_size:
+            return 413, b"Upload too large\n", "text/plain", False
+        expect = headers.get("expect", "").lower()
+        if expect not in ("", "100-continue"):
+            return 417, b"Unknown expectation\n", "text/plain", False
+
+        async with self.upload_slots:
+            if expect == "100-continue":
+                # curl waits for this before sending uploads over 1 MB
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+                await writer.drain()
+            upload = await reader.readexactly(length)
+            try:
+                summary = await self.ingest(run_id, kind, upload)
+            except Exception as exc:
+                logging.warning(f"Cannot merge upload into {run_id}: {exc}")
+                body = f"Cannot parse upload: {exc}\n".encode()
+                return 400, body, "text/plain", True
+        return 200, json.dumps(summary).encode(), "application/json", True
+
+    async def ingest(self, run_id: str, kind: str, upload: bytes) -> dict:
+        """Parse an upload in the worker pool and fold it into its run"""
+        loop = asyncio.get_running_loop()
+        if kind == "junit":
+            items = await loop.run_in_executor(
+                self.executor, parse_junit_upload, upload
+            )
+        else:
+            items = await loop.run_in_executor(
+                self.executor, parse_report_html_upload, upload
+            )
+
+        run = self.runs.setdefault(run_id, RunState())
+        async with run.lock:
+            await loop.run_in_executor(
+                self.executor, self.fold, run, kind, items
+            )
+            run.uploads += 1
+            return self.summarize(run_id, run, kind)
+
+    def fold(self, run: RunState, kind: str, items: list) -> None:
+        for item in items:
+            if kind == "junit":
+                fold_test_suite(
+                    run.test_suite, item, classname_name_key, self.policy
+                )
+            else:
+                fold_test_run(
+                    run.test_run_summary, item, node_id_key, self.policy
+                )
+
+    def summarize(self, run_id: str, run: RunState, kind: str) -> dict:
+        if kind == "junit":
+            test_suite = run.test_suite
+            return {
+                "run": run_id,
+                "uploads": run.uploads,
+                "tests": test_suite.tests,
+                "errors": test_suite.errors,
+                "failures": test_suite.failures,
+                "skipped": test_suite.skipped,
+            }
+        test_run_summary = run.test_run_summary
+        return {
+            "run": run_id,
+            "uploads": run.uploads,
+            "tests": test_run_summary.total_tests,
+            "passed": test_run_summary.total_passed_tests,
+            "failed": test_run_summary.total_failed_tests,
+            "errors": test_run_summary.total_errors,
+            "skipped": test_run_summary.total_skipped_tests,
+        }
+
+    async def render(self, run: RunState, kind: str) -> tuple[bytes, str]:
+        loop = asyncio.get_running_loop()
+        async with run.lock:
+            if kind == "junit":
+                body = await loop.run_in_executor(
+                    self.executor, render_junit, run.test_suite
+                )
+                return body, "application/xml"
+            body = await loop.run_in_executor(
+                self.executor, render_report_html, run.test_run_summary
+            )
+            return body, "text/html; charset=utf-8"
+
+
+def parse_junit_upload(upload: bytes) -> list[TestSuite]:
+    return parse_junit_xml([io.BytesIO(upload)]).test_suites
+
+
+def parse_report_html_upload(upload: bytes) -> list[TestRunSummary]:
+    selector = Selector(text=upload.decode("utf-8"))
+    return [parse_report_html_selector(selector)]
+
+
+def render_junit(test_suite: TestSuite) -> bytes:
+    junit_xml = io.BytesIO()
+    create_junit_file(test_suite, junit_xml)
+    return junit_xml.getvalue()
+
+
+def render_report_html(test_run_summary: TestRunSummary) -> bytes:
+    report_html = io.StringIO()
+    write_report_html(test_run_summary, report_html)
+    return report_html.getvalue().encode("utf-8")
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    max_workers: int = 4,
+    max_pending_uploads: int = 16,
+    max_upload_size: int = 256 * 1024 * 1024,
+    policy: ResolutionPolicy = latest_wins,
+) -> None:
+    """Run a MergeServer until interrupted"""
+    server = MergeServer(
+        host, port, max_workers, max_pending_uploads, max_upload_size, policy
+    )
+
+    async def run() -> None:
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        logging.info("Merge server stopped")
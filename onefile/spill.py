@@ -0,0 +1,103 @@
+from typing import Any, BinaryIO, Callable, Iterator, Optional
+import heapq
+import logging
+import pickle
+import tempfile
+
+# Number of runs merged at once, more runs are first merged into one run so
+# the number of open temporary files stays bounded.
+MAX_OPEN_RUNS = 64
+
+
+class SpillSorter:
+    """Sort more records than fit in memory
+
+    Records are buffered pickled until their size reaches memory_limit bytes,
+    then the buffer is sorted and spilled to a temporary file as a sorted run.
+    Only the pickled bytes are kept in the buffer, the sort keys are derived
+    from them when sorting. sorted_records() does a k-way merge of the runs
+    and the records still in the buffer.
+    """
+
+    def __init__(
+        self,
+        sort_key: Callable[[Any], Any],
+        memory_limit: int,
+        temp_dir: Optional[str] = None,
+    ):
+        self.sort_key = sort_key
+        self.memory_limit = memory_limit
+        self.temp_dir = temp_dir
+        self.buffer: list[bytes] = []
+        self.buffer_size = 0
+        self.runs: list[BinaryIO] = []
+
+    def add(self, record: Any) -> None:
+        data = pickle.dumps(record, pickle.HIGHEST_PROTOCOL)
+        self.buffer.append(data)
+        self.buffer_size += len(data)
+        if self.buffer_size >= self.memory_limit:
+            self.spill()
+
+    def spill(self) -> None:
+        """Write the buffered records to a new sorted run"""
+        logging.debug(
+            f"Spill {len(self.buffer)} records ({self.buffer_size} bytes)"
+        )
+        self.sort_buffer()
+        run = tempfile.TemporaryFile(prefix="onefile-", dir=self.temp_dir)
+        for data in self.buffer:
+            run.write(data)
+        self.buffer = []
+        self.buffer_size = 0
+        self.add_run(run)
+
+    def sort_buffer(self) -> None:
+        sort_key = self.sort_key
+        self.buffer.sort(key=lambda data: sort_key(pickle.loads(data)))
+
+    def add_run(self, run: BinaryIO) -> None:
+        self.runs.append(run)
+        if len(self.runs) >= MAX_OPEN_RUNS:
+            logging.debug(f"Merge {len(self.runs)} runs into one")
+            merged_run = tempfile.TemporaryFile(
+                prefix="onefile-", dir=self.temp_dir
+            )
+            for record in heapq.merge(
+                *(self.read_run(run) for run in self.runs), key=self.sort_key
+            ):
+                pickle.dump(record, merged_run, pickle.HIGHEST_PROTOCOL)
+            self.close()
+            self.runs = [merged_run]
+
+    def read_run(self, run: BinaryIO) -> Iterator[Any]:
+        run.seek(0)
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+
+    def sorted_records(self) -> Iterator[Any]:
+        """Yield every added record in sort_key order"""
+        if self.runs and self.buffer:
+            # The buffer would stay in memory until the merge is done
+            self.spill()
+        self.sort_buffer()
+        buffered = (pickle.loads(data) for data in self.buffer)
+        yield from heapq.merge(
+            *(self.read_run(run) for run in self.runs),
+            buffered,
+            key=self.sort_key,
+        )
+
+    def close(self) -> None:
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+    def __enter__(self) -> "SpillSorter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
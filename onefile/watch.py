@@ -0,0 +1,284 @@
+from abc import ABC, abstractmethod
+from lxml import etree
+from typing import Optional
+import fnmatch
+import logging
+import os
+import stat
+import tempfile
+import time
+
+from onefile import init_onefile
+from onefile.junit import (
+    TestSuite,
+    create_junit_file,
+    fold_test_suite,
+    parse_junit_xml,
+)
+from onefile.report_html import (
+    TestRunSummary,
+    create_report_html_file,
+    fold_test_run,
+    parse_report_html_files,
+)
+
+init_onefile()
+
+TEMP_FILE_PREFIX = ".onefile-"
+
+
+def output_file_mode(file_path: str) -> int:
+    """Return the mode of the existing file, or the one open() would use"""
+    try:
+        return stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+class ShardWatcher(ABC):
+    """Merge the shards landing in a directory into one output file
+
+    The directory is polled with os.scandir, which needs no extra dependency
+    and works on network file systems where inotify does not. A shard is
+    folded into the in-memory merge state once its size and modification time
+    have not changed for `debounce` seconds, and the output file is rewritten
+    atomically after every poll that folded something.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        output_path: str,
+        pattern: str,
+        interval: float = 1.0,
+        debounce: float = 2.0,
+    ):
+        self.directory = directory
+        self.output_path = output_path
+        self.pattern = pattern
+        self.interval = interval
+        self.debounce = debounce
+        self.state = self.new_state()
+        self.folded: dict[str, tuple[int, int]] = {}
+        self.pending: dict[str, tuple[tuple[int, int], float]] = {}
+        self.last_change = time.monotonic()
+        self.stopped = False
+
+    @abstractmethod
+    def new_state(self):
+        """Return an empty merge state"""
+
+    @abstractmethod
+    def parse_file(self, file_path: str) -> list:
+        """Parse a shard into the items to fold"""
+
+    @abstractmethod
+    def fold(self, item) -> None:
+        """Fold one parsed item into the merge state"""
+
+    @abstractmethod
+    def write(self, file_path: str) -> None:
+        """Write the merge state to file_path"""
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        """Return the (mtime, size) signature of every matching shard"""
+        output_path = os.path.abspath(self.output_path)
+        signatures = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if (
+                    not entry.is_file()
+                    or entry.name.startswith(TEMP_FILE_PREFIX)
+                    or not fnmatch.fnmatch(entry.name, self.pattern)
+                    or os.path.abspath(entry.path) == output_path
+                ):
+                    continue
+                try:
+                    entry_stat = entry.stat()
+                except FileNotFoundError:
+                    # Deleted or renamed since the directory was listed
+                    continue
+                signatures[entry.path] = (
+                    entry_stat.st_mtime_ns,
+                    entry_stat.st_size,
+                )
+        return signatures
+
+    def poll(self, now: Optional[float] = None) -> bool:
+        """Fold the settled shards and rewrite the output if anything changed
+
+        Return True when the output file was rewritten.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        signatures = self.scan()
+        deleted = [path for path in self.folded if path not in signatures]
+        for file_path in deleted:
+            logging.info(f"Shard deleted: {file_path}")
+            del self.folded[file_path]
+        for file_path in [p for p in self.pending if p not in signatures]:
+            del self.pending[file_path]
+
+        ready = []
+        for file_path, signature in sorted(signatures.items()):
+            if self.folded.get(file_path) == signature:
+                continue
+            pending = self.pending.get(file_path)
+            if pending is None or pending[0] != signature:
+                logging.debug(f"Shard detected: {file_path}")
+                self.pending[file_path] = (signature, now)
+                pending = self.pending[file_path]
+            if now - pending[1] >= self.debounce:
+                ready.append((file_path, signature))
+
+        if not ready and not deleted:
+            return False
+
+        is_rebuild_needed = bool(deleted) or any(
+            file_path in self.folded for file_path, _ in ready
+        )
+        for file_path, signature in ready:
+            del self.pending[file_path]
+            self.folded[file_path] = signature
+
+        if is_rebuild_needed:
+            logging.info("Shard changed or deleted, rebuild the merge state")
+            self.state = self.new_state()
+            file_paths = list(self.folded)
+        else:
+            file_paths = [file_path for file_path, _ in ready]
+
+        for file_path in file_paths:
+            logging.info(f"Fold shard: {file_path}")
+            try:
+                items = self.parse_file(file_path)
+            except (
+                etree.LxmlError,
+                OSError,
+                ValueError,
+                AttributeError,
+                IndexError,
+                TypeError,
+            ) as exc:
+                logging.warning(f"Skip unparsable shard {file_path}: {exc}")
+                continue
+            for item in items:
+                self.fold(item)
+
+        self.write_atomically()
+        self.last_change = now
+        return True
+
+    def write_atomically(self) -> None:
+        """Write the output to a temporary file and move it into place"""
+        output_dir = os.path.dirname(os.path.abspath(self.output_path))
+        fd, temp_path = tempfile.mkstemp(
+            prefix=TEMP_FILE_PREFIX,
+            suffix=os.path.splitext(self.output_path)[1],
+            dir=output_dir,
+        )
+        os.close(fd)
+        try:
+            self.write(temp_path)
+            # mkstemp creates the file with mode 0600, keep the usual one
+            os.chmod(temp_path, output_file_mode(self.output_path))
+            os.replace(temp_path, self.output_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        logging.info(f"Output rewritten: {self.output_path}")
+
+    def run(self, idle_timeout: Optional[float] = None) -> None:
+        """Poll until stopped, or until no shard arrived for idle_timeout"""
+        logging.info(f"Watch {self.directory} for {self.pattern} shards")
+        self.last_change = time.monotonic()
+        while not self.stopped:
+            self.poll()
+            if (
+                idle_timeout is not None
+                and not self.pending
+                and time.monotonic() - self.last_change >= idle_timeout
+            ):
+                logging.info("No new shard arrived, stop watching")
+                break
+            time.sleep(self.interval)
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+class JunitWatcher(ShardWatcher):
+    def __init__(
+        self,
+        directory: str,
+        output_path: str = "junit.xml",
+        pattern: str = "*.xml",
+        interval: float = 1.0,
+        debounce: float = 2.0,
+    ):
+        super().__init__(directory, output_path, pattern, interval, debounce)
+
+    def new_state(self) -> TestSuite:
+        return TestSuite()
+
+    def parse_file(self, file_path: str) -> list:
+        return parse_junit_xml([file_path]).test_suites
+
+    def fold(self, item: TestSuite) -> None:
+        fold_test_suite(self.state, item)
+
+    def write(self, file_path: str) -> None:
+        create_junit_file(self.state, file_path)
+
+
+class ReportHtmlWatcher(ShardWatcher):
+    def __init__(
+        self,
+        directory: str,
+        output_path: str = "report.html",
+        pattern: str = "*.html",
+        interval: float = 1.0,
+        debounce: float = 2.0,
+    ):
+        super().__init__(directory, output_path, pattern, interval, debounce)
+
+    def new_state(self) -> TestRunSummary:
+        return TestRunSummary()
+
+    def parse_file(self, file_path: str) -> list:
+        return parse_report_html_files([file_path]).test_run_summaries
+
+    def fold(self, item: TestRunSummary) -> None:
+        fold_test_run(self.state, item)
+
+    def write(self, file_path: str) -> None:
+        create_report_html_file(self.state, file_path)
+
+
+def watch_junit_files(
+    directory: str,
+    output_path: str = "junit.xml",
+    pattern: str = "*.xml",
+    interval: float = 1.0,
+    debounce: float = 2.0,
+    idle_timeout: Optional[float] = None,
+) -> None:
+    JunitWatcher(directory, output_path, pattern, interval, debounce).run(
+        idle_timeout
+    )
+
+
+def watch_report_html_files(
+    directory: str,
+    output_path: str = "report.html",
+    pattern: str = "*.html",
+    interval: float = 1.0,
+    debounce: float = 2.0,
+    idle_timeout: Optional[float] = None,
+) -> None:
+    ReportHtmlWatcher(
+        directory, output_path, pattern, interval, debounce
+    ).run(idle_timeout)
@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime
+
+from onefile.attributes import (
+    FALLBACK_TIMESTAMP,
+    format_report_timestamp,
+    is_latest_timestamp,
+    parse_iso_timestamp,
+    parse_leading_int,
+    parse_report_timestamp,
+)
+
+
+class TestTimestamps(unittest.TestCase):
+    def test_iso_timestamp(self):
+        assert parse_iso_timestamp("2024-01-07T18:50:09.552277") == datetime(
+            2024, 1, 7, 18, 50, 9, 552277
+        )
+        assert parse_iso_timestamp("") == FALLBACK_TIMESTAMP
+
+    def test_report_timestamp(self):
+        assert parse_report_timestamp("08-Mar-2024 at 06:57:30") == datetime(
+            2024, 3, 8, 6, 57, 30
+        )
+        assert parse_report_timestamp("") == FALLBACK_TIMESTAMP
+
+    def test_report_timestamp_round_trip(self):
+        timestamp = datetime(2024, 3, 8, 6, 57, 30)
+        assert format_report_timestamp(timestamp) == "08-Mar-2024 at 06:57:30"
+        assert (
+            parse_report_timestamp(format_report_timestamp(timestamp))
+            == timestamp
+        )
+        assert parse_report_timestamp("2024-03-08 06:57:30") == timestamp
+
+    def test_is_latest_timestamp(self):
+        timestamp = datetime(2024, 3, 8, 6, 57, 30)
+        assert is_latest_timestamp(timestamp, None)
+        assert is_latest_timestamp(timestamp, FALLBACK_TIMESTAMP)
+        assert not is_latest_timestamp(FALLBACK_TIMESTAMP, timestamp)
+        assert not is_latest_timestamp(timestamp, timestamp)
+        assert is_latest_timestamp(FALLBACK_TIMESTAMP, FALLBACK_TIMESTAMP)
+
+    def test_cached(self):
+        parse_iso_timestamp.cache_clear()
+        for _ in range(3):
+            parse_iso_timestamp("2024-01-07T18:41:28.776987")
+        assert parse_iso_timestamp.cache_info().hits == 2
+
+
+class TestCounters(unittest.TestCase):
+    def test_leading_int(self):
+        assert parse_leading_int("4 passed") == 4
+        assert parse_leading_int("1 expected failures") == 1
@@ -0,0 +1,63 @@
+import unittest
+import contextlib
+import io
+import os
+import tempfile
+
+from onefile.cli import main
+from onefile.junit import parse_junit_xml
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+JUNIT_0 = os.path.join(TEST_DIR, "junit", "junit_0.xml")
+JUNIT_1 = os.path.join(TEST_DIR, "junit", "junit_1.xml")
+REPORT_1 = os.path.join(TEST_DIR, "report_html", "report_1.html")
+REPORT_2 = os.path.join(TEST_DIR, "report_html", "report_2.html")
+
+
+class TestMergeCommand(unittest.TestCase):
+    def test_merge_junit(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            output_path = os.path.join(tmp_dir, "junit.xml")
+            exit_code = main(
+                ["merge", JUNIT_0, JUNIT_1, "-o", output_path]
+                + ["--outcomes", "failure"]
+            )
+            assert exit_code == 0
+            test_suite = parse_junit_xml([output_path]).test_suites[0]
+        assert test_suite.tests == 8
+        assert [tc.name for tc in test_suite.test_cases] == ["test_dog[white]"]
+
+
+class TestDiffCommand(unittest.TestCase):
+    def run_diff(self, *args):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            exit_code = main(["diff", *args])
+        return exit_code, stdout.getvalue().splitlines()
+
+    def test_diff(self):
+        exit_code, lines = self.run_diff(
+            JUNIT_0, JUNIT_1, "--kinds", "new_failure"
+        )
+        assert exit_code == 0
+        assert lines == [
+            "new_failure\tlong.way.to.test_puppet.TestPuppet::test_dog[small]"
+            "\t- -> error",
+            "new_failure\tlong.way.to.test_puppet.TestPuppet::test_dog[white]"
+            "\tpassed -> failure",
+        ]
+
+    def test_diff_merged_report_html(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            old_path = os.path.join(tmp_dir, "old.html")
+            new_path = os.path.join(tmp_dir, "new.html")
+            assert main(["merge", REPORT_1, "-o", old_path]) == 0
+            assert main(["merge", REPORT_1, REPORT_2, "-o", new_path]) == 0
+            exit_code, lines = self.run_diff(old_path, new_path)
+        assert exit_code == 0
+        assert lines
+        assert all(line.split("\t")[0] == "added" for line in lines)
+
+    def test_exit_code(self):
+        assert self.run_diff(JUNIT_0, JUNIT_1, "--exit-code")[0] == 1
+        assert self.run_diff(JUNIT_1, JUNIT_0, "--exit-code")[0] == 0
@@ -0,0 +1,104 @@
+import unittest
+import os
+
+from onefile.diff import (
+    ADDED,
+    DURATION_REGRESSION,
+    FIXED,
+    NEW_FAILURE,
+    NEWLY_SKIPPED,
+    REMOVED,
+    diff_test_runs,
+    diff_test_suites,
+)
+from onefile.junit import parse_junit_xml, merge_test_suites
+from onefile.report_html import parse_report_html_files, merge_test_runs
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+JUNIT_DIR = os.path.join(TEST_DIR, "junit")
+REPORT_HTML_DIR = os.path.join(TEST_DIR, "report_html")
+
+
+def load_junit(*names):
+    return merge_test_suites(
+        parse_junit_xml([os.path.join(JUNIT_DIR, name) for name in names])
+    )
+
+
+def kinds_by_name(differences):
+    kinds = {}
+    for difference in differences:
+        kinds.setdefault(difference.name.split("::")[-1], []).append(
+            difference.kind
+        )
+    return kinds
+
+
+class TestDiffTestSuites(unittest.TestCase):
+    def test_new_failures(self):
+        kinds = kinds_by_name(
+            diff_test_suites(load_junit("junit_0.xml"), load_junit("junit_1.xml"))
+        )
+        assert kinds["test_dog[white]"] == [NEW_FAILURE, DURATION_REGRESSION]
+        assert kinds["test_dog[small]"] == [NEW_FAILURE]
+        assert kinds["test_cat[big]"] == [ADDED]
+
+    def test_fixed_and_removed(self):
+        kinds = kinds_by_name(
+            diff_test_suites(
+                load_junit("junit_1.xml", "junit_2.xml"),
+                load_junit("junit_0.xml"),
+            )
+        )
+        assert kinds["test_dog[white]"] == [FIXED]
+        assert kinds["test_tiger"] == [REMOVED]
+        assert kinds["test_dog[small]"] == [REMOVED]
+
+    def test_newly_skipped(self):
+        old_test_suite = load_junit("junit_2.xml")
+        new_test_suite = load_junit("junit_2.xml")
+        old_test_suite.test_cases[0].skipped = None
+        kinds = kinds_by_name(diff_test_suites(old_test_suite, new_test_suite))
+        assert kinds == {"test_tiger": [NEWLY_SKIPPED]}
+
+    def test_duration_thresholds(self):
+        old_test_suite = load_junit("junit_0.xml")
+        new_test_suite = load_junit("junit_0.xml")
+        new_test_suite.test_cases[0].time = 9.0
+        assert list(diff_test_suites(old_test_suite, new_test_suite)) == []
+        differences = list(
+            diff_test_suites(
+                old_test_suite, new_test_suite, duration_ratio=0.2
+            )
+        )
+        assert [difference.kind for difference in differences] == [
+            DURATION_REGRESSION
+        ]
+        assert differences[0].detail == "7.062s -> 9.0s"
+        assert (
+            list(
+                diff_test_suites(
+                    old_test_suite,
+                    new_test_suite,
+                    duration_ratio=0.2,
+                    duration_delta=5,
+                )
+            )
+            == []
+        )
+
+
+class TestDiffTestRuns(unittest.TestCase):
+    def test_diff(self):
+        old_test_run_summary, new_test_run_summary = (
+            merge_test_runs(
+                parse_report_html_files([os.path.join(REPORT_HTML_DIR, name)])
+            )
+            for name in ("report_1.html", "report_2.html")
+        )
+        kinds = kinds_by_name(
+            diff_test_runs(old_test_run_summary, new_test_run_summary)
+        )
+        assert kinds["test_cat"] == [NEW_FAILURE]
+        assert kinds["test_lion"] == [ADDED]
+        assert kinds["test_dog"] == [REMOVED]
@@ -1,8 +1,22 @@
 import unittest
 import os
 import glob
+import tempfile
+from unittest.mock import patch
+from lxml import etree
 
-from onefile.junit import parse_junit_xml, merge_test_suites, create_junit_file
+from onefile.attributes import FALLBACK_TIMESTAMP
+from onefile.policies import best_outcome_wins
+from onefile import junit
+from onefile.junit import (
+    CaseFilter,
+    CaseTally,
+    parse_test_case_elem,
+    parse_junit_xml,
+    merge_test_suites,
+    create_junit_file,
+    merge_junit_files,
+)
 
 TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data", "junit")
 
@@ -47,6 +61,46 @@ class TestParse(unittest.TestCase):
                     assert test_case.failure.text == "AssertionError!!!"
                     break
 
+    def test_parse_mmap(self):
+        files = sorted(glob.glob(os.path.join(TEST_DIR, "junit_*.xml")))
+        expected = parse_junit_xml(files)
+        test_suites = parse_junit_xml(files, use_mmap=True)
+        assert repr(test_suites) == repr(expected)
+        with patch("onefile.mmap_reader.MMAP_CHUNK_SIZE", 7):
+            test_suites = parse_junit_xml(files, use_mmap=True)
+        assert repr(test_suites) == repr(expected)
+
+    def test_missing_timestamp(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "junit.xml")
+            with open(file_path, "w") as junit_xml:
+                junit_xml.write(
+                    '<testsuites><testsuite name="pytest">'
+                    '<testcase classname="a" name="b"/>'
+                    "</testsuite></testsuites>"
+                )
+            test_suites = parse_junit_xml([file_path])
+        assert test_suites.test_suites[0].timestamp == FALLBACK_TIMESTAMP
+
+    def test_missing_timestamps_later_file_wins(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_paths = []
+            for index, child in enumerate(("<failure/>", "")):
+                file_path = os.path.join(tmp_dir, f"junit_{index}.xml")
+                with open(file_path, "w") as junit_xml:
+                    junit_xml.write(
+                        '<testsuites><testsuite name="pytest">'
+                        f'<testcase classname="a" name="b">{child}</testcase>'
+                        "</testsuite></testsuites>"
+                    )
+                file_paths.append(file_path)
+            final_test_suite = merge_test_suites(parse_junit_xml(file_paths))
+            assert final_test_suite.failures == 0
+            final_test_suite = merge_test_suites(
+                parse_junit_xml(list(reversed(file_paths)))
+            )
+            assert final_test_suite.failures == 1
+
 
 class TestMerge(unittest.TestCase):
     def test_merge(self):
@@ -94,5 +148,155 @@ class TestCreateJunitFile(unittest.TestCase):
         create_junit_file(final_test_suite)
 
 
+class TestMergeJunitFilesExternal(unittest.TestCase):
+    def assert_same_output(self, files, memory_limit, use_mmap=False):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            expected_path = os.path.join(tmp_dir, "expected.xml")
+            merge_junit_files(files, expected_path)
+            output_path = os.path.join(tmp_dir, "junit.xml")
+            merge_junit_files(
+                files,
+                output_path,
+                use_mmap=use_mmap,
+                memory_limit=memory_limit,
+            )
+            with open(expected_path, "rb") as expected, open(
+                output_path, "rb"
+            ) as output:
+                assert output.read() == expected.read()
+
+    def test_same_output_as_in_memory_merge(self):
+        files = sorted(glob.glob(os.path.join(TEST_DIR, "junit_*.xml")))
+        self.assert_same_output(files, memory_limit=1024 * 1024)
+        self.assert_same_output(list(reversed(files)), memory_limit=1)
+
+    def test_mmap(self):
+        files = sorted(glob.glob(os.path.join(TEST_DIR, "junit_*.xml")))
+        with patch(
+            "onefile.junit.open_mmap", wraps=junit.open_mmap
+        ) as open_mmap:
+            self.assert_same_output(files, memory_limit=1, use_mmap=True)
+        assert open_mmap.call_count == len(files)
+
+    def test_many_runs(self):
+        files = sorted(glob.glob(os.path.join(TEST_DIR, "junit_*.xml")))
+        with patch("onefile.spill.MAX_OPEN_RUNS", 3):
+            self.assert_same_output(files * 3, memory_limit=1)
+
+    def test_no_test_cases(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            empty_path = os.path.join(tmp_dir, "empty.xml")
+            with open(empty_path, "w") as empty:
+                empty.write(
+                    '<testsuites><testsuite name="pytest" '
+                    'timestamp="2024-01-07T18:41:28"/></testsuites>'
+                )
+            self.assert_same_output([empty_path], memory_limit=1)
+
+
+class TestCaseFilter(unittest.TestCase):
+    def setUp(self):
+        self.files = sorted(glob.glob(os.path.join(TEST_DIR, "junit_*.xml")))
+
+    def merge(self, case_filter, **kwargs):
+        return merge_test_suites(
+            parse_junit_xml(self.files, case_filter=case_filter), **kwargs
+        )
+
+    def test_failures_only(self):
+        final_test_suite = self.merge(CaseFilter(outcomes={"failure"}))
+        assert [tc.name for tc in final_test_suite.test_cases] == [
+            "test_dog[white]"
+        ]
+        failure = final_test_suite.test_cases[0].failure
+        assert failure.message == "AssertionError: Locator expected to be visible"
+        assert final_test_suite.tests == 9
+        assert final_test_suite.errors == 1
+        assert final_test_suite.failures == 1
+        assert final_test_suite.skipped == 1
+
+    def test_classname_and_min_time(self):
+        final_test_suite = self.merge(CaseFilter(classname="other.*"))
+        assert final_test_suite.test_cases == []
+        assert final_test_suite.tests == 9
+
+        final_test_suite = self.merge(
+            CaseFilter(classname="long.way.*", min_time=8)
+        )
+        assert sorted(tc.name for tc in final_test_suite.test_cases) == [
+            "test_cat[black]",
+            "test_dog[white]",
+        ]
+
+    def test_rejected_test_case_wins(self):
+        final_test_suite = self.merge(
+            CaseFilter(outcomes={"failure"}), policy=best_outcome_wins
+        )
+        assert final_test_suite.test_cases == []
+        assert final_test_suite.failures == 0
+        assert final_test_suite.tests == 9
+
+    def test_mmap(self):
+        case_filter = CaseFilter(outcomes={"error", "skipped"})
+        test_suites = parse_junit_xml(self.files, case_filter=case_filter)
+        mmap_test_suites = parse_junit_xml(
+            self.files, use_mmap=True, case_filter=case_filter
+        )
+        assert repr(mmap_test_suites) == repr(test_suites)
+
+    def test_same_output_as_external_merge(self):
+        case_filter = CaseFilter(outcomes={"failure", "error"})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputs = []
+            for memory_limit in (None, 1):
+                output_path = os.path.join(tmp_dir, f"{memory_limit}.xml")
+                merge_junit_files(
+                    self.files,
+                    output_path,
+                    memory_limit=memory_limit,
+                    case_filter=case_filter,
+                )
+                with open(output_path, "rb") as output:
+                    outputs.append(output.read())
+        assert outputs[0] == outputs[1]
+        assert b"test_dog[small]" in outputs[0]
+        assert b"test_cat[big]" not in outputs[0]
+
+    def test_accepts_elem(self):
+        case_filters = [
+            CaseFilter(outcomes={"failure"}),
+            CaseFilter(outcomes={"passed", "skipped"}),
+            CaseFilter(classname="long.way.*", min_time=8),
+        ]
+        for file_path in self.files:
+            for test_suite_elem in etree.parse(file_path).getroot():
+                for test_case_elem in test_suite_elem:
+                    test_case = parse_test_case_elem(test_case_elem)
+                    for case_filter in case_filters:
+                        assert case_filter.accepts_elem(
+                            test_case_elem
+                        ) == case_filter.accepts(test_case)
+
+    def test_shared_tallies(self):
+        final_test_suite = junit.TestSuite()
+        test_suites = parse_junit_xml(
+            self.files, case_filter=CaseFilter(outcomes={"failure"})
+        )
+        for test_suite in test_suites.test_suites:
+            junit.fold_test_suite(final_test_suite, test_suite)
+        tallies = {
+            id(test_case)
+            for test_case in final_test_suite.test_cases
+            if isinstance(test_case, CaseTally)
+        }
+        # passed, error and skipped
+        assert len(tallies) == 3
+        assert final_test_suite.tests == 9
+
+    def test_unknown_outcome(self):
+        with self.assertRaises(ValueError):
+            CaseFilter(outcomes={"failed"})
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+import os
+import tempfile
+
+from onefile.junit import parse_junit_xml, merge_test_suites, merge_junit_files
+from onefile.report_html import parse_report_html_files, merge_test_runs
+from onefile.policies import (
+    best_outcome_wins,
+    longest_wins,
+    outcome,
+    unparametrized_key,
+    worst_outcome_wins,
+)
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+JUNIT_0 = os.path.join(TEST_DIR, "junit", "junit_0.xml")
+JUNIT_1 = os.path.join(TEST_DIR, "junit", "junit_1.xml")
+REPORT_HTML_FILES = [
+    os.path.join(TEST_DIR, "report_html", "report_1.html"),
+    os.path.join(TEST_DIR, "report_html", "report_2.html"),
+]
+
+
+def find_test_case(test_suite, name):
+    return next(tc for tc in test_suite.test_cases if tc.name == name)
+
+
+class TestResolutionPolicies(unittest.TestCase):
+    def merge(self, files, **kwargs):
+        return merge_test_suites(parse_junit_xml(files), **kwargs)
+
+    def test_latest_wins(self):
+        for files in ([JUNIT_0, JUNIT_1], [JUNIT_1, JUNIT_0]):
+            final_test_suite = self.merge(files)
+            test_case = find_test_case(final_test_suite, "test_dog[white]")
+            assert outcome(test_case) == "failure"
+            assert final_test_suite.failures == 1
+
+    def test_best_outcome_wins(self):
+        for files in ([JUNIT_0, JUNIT_1], [JUNIT_1, JUNIT_0]):
+            final_test_suite = self.merge(files, policy=best_outcome_wins)
+            test_case = find_test_case(final_test_suite, "test_dog[white]")
+            assert outcome(test_case) == "passed"
+            assert test_case.time == 7.062
+            assert final_test_suite.failures == 0
+
+    def test_worst_outcome_wins(self):
+        for files in ([JUNIT_0, JUNIT_1], [JUNIT_1, JUNIT_0]):
+            final_test_suite = self.merge(files, policy=worst_outcome_wins)
+            test_case = find_test_case(final_test_suite, "test_dog[white]")
+            assert outcome(test_case) == "failure"
+            assert final_test_suite.failures == 1
+
+    def test_longest_wins(self):
+        final_test_suite = self.merge(
+            [JUNIT_1, JUNIT_0], policy=longest_wins
+        )
+        test_case = find_test_case(final_test_suite, "test_dog[white]")
+        assert test_case.time == 16.736
+
+    def test_report_html_policy(self):
+        test_run_summary = merge_test_runs(
+            parse_report_html_files(REPORT_HTML_FILES),
+            policy=worst_outcome_wins,
+        )
+        results = [tr.result for tr in test_run_summary.test_results]
+        assert test_run_summary.total_failed_tests == results.count("Failed")
+        assert test_run_summary.total_passed_tests == results.count("Passed")
+        assert "Failed" in results
+
+
+class TestKeyFunctions(unittest.TestCase):
+    def test_unparametrized_key(self):
+        final_test_suite = merge_test_suites(
+            parse_junit_xml([JUNIT_0, JUNIT_1]), key=unparametrized_key
+        )
+        assert final_test_suite.tests == 2
+        assert len(final_test_suite.test_cases) == 2
+
+    def test_external_merge(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputs = []
+            for memory_limit in (None, 1):
+                output_path = os.path.join(tmp_dir, f"{memory_limit}.xml")
+                merge_junit_files(
+                    [JUNIT_1, JUNIT_0],
+                    output_path,
+                    memory_limit=memory_limit,
+                    key=unparametrized_key,
+                    policy=best_outcome_wins,
+                )
+                with open(output_path, "rb") as output:
+                    outputs.append(output.read())
+        assert outputs[0] == outputs[1]
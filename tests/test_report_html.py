@@ -1,12 +1,15 @@
 import unittest
 import os
 import glob
+import tempfile
 from parsel import Selector
 
 from onefile.report_html import (
     parse_report_html_files,
     merge_test_runs,
     create_report_html_file,
+    create_paginated_report_html_files,
+    page_file_path,
 )
 
 TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data", "report_html")
@@ -19,6 +22,12 @@ class TestParse(unittest.TestCase):
         test_run_summaries = parse_report_html_files(test_files)
         assert len(test_run_summaries.test_run_summaries) == 2
 
+    def test_parse_mmap(self):
+        test_files = sorted(glob.glob(os.path.join(TEST_DIR, "report_*.html")))
+        expected = parse_report_html_files(test_files)
+        test_run_summaries = parse_report_html_files(test_files, use_mmap=True)
+        assert repr(test_run_summaries) == repr(expected)
+
 
 class TestMerge(unittest.TestCase):
     def test_merge(self):
@@ -48,3 +57,60 @@ class TestCreateReportHtmlFile(unittest.TestCase):
             selector.css("span.xpassed::text").get() == "1 unexpected passes"
         )
         assert selector.css("span.rerun::text").get() == "0 rerun"
+
+
+class TestCreatePaginatedReportHtmlFiles(unittest.TestCase):
+    def test_create_paginated_files(self):
+        test_files = glob.glob(os.path.join(TEST_DIR, "report_*.html"))
+        test_run_summaries = parse_report_html_files(test_files)
+        test_run_summary = merge_test_runs(test_run_summaries)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, "report.html")
+            create_report_html_file(test_run_summary, index_path, page_size=3)
+
+            with open(index_path) as index_html:
+                selector = Selector(text=index_html.read())
+            assert selector.css("span.passed::text").get() == "4 passed"
+            assert selector.css("ul.pages a::attr(href)").getall() == [
+                "report_page_1.html",
+                "report_page_2.html",
+                "report_page_3.html",
+            ]
+            assert selector.css("tbody.results-table-row").getall() == []
+
+            tests = []
+            for page_number in range(1, 4):
+                with open(page_file_path(index_path, page_number)) as page:
+                    selector = Selector(text=page.read())
+                rows = selector.css("tbody.results-table-row")
+                assert len(rows) == (1 if page_number == 3 else 3)
+                tests += rows.css("td.col-name::text").getall()
+            assert tests == [tr.test for tr in test_run_summary.test_results]
+
+    def test_no_results(self):
+        test_run_summary = merge_test_runs(parse_report_html_files([]))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, "report.html")
+            create_report_html_file(test_run_summary, index_path, page_size=3)
+            with open(index_path) as index_html:
+                selector = Selector(text=index_html.read())
+        assert selector.css("ul.pages li::text").getall() == [" (no results)"]
+
+    def test_stale_pages_removed(self):
+        test_files = glob.glob(os.path.join(TEST_DIR, "report_*.html"))
+        test_run_summary = merge_test_runs(parse_report_html_files(test_files))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            index_path = os.path.join(tmp_dir, "report.html")
+            create_report_html_file(test_run_summary, index_path, page_size=2)
+            assert os.path.exists(page_file_path(index_path, 4))
+
+            create_report_html_file(test_run_summary, index_path, page_size=5)
+            assert os.path.exists(page_file_path(index_path, 2))
+            assert not os.path.exists(page_file_path(index_path, 3))
+            assert not os.path.exists(page_file_path(index_path, 4))
+
+    def test_invalid_page_size(self):
+        with self.assertRaises(ValueError):
+            create_paginated_report_html_files(
+                merge_test_runs(parse_report_html_files([])), page_size=0
+            )
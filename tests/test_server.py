@@ -0,0 +1,180 @@
+import unittest
+import asyncio
+import http.client
+import io
+import json
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from parsel import Selector
+
+from onefile.junit import parse_junit_xml
+from onefile.server import MergeServer
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+JUNIT_FILES = [
+    os.path.join(TEST_DIR, "junit", f"junit_{index}.xml")
+    for index in range(3)
+]
+REPORT_HTML_FILES = [
+    os.path.join(TEST_DIR, "report_html", f"report_{index}.html")
+    for index in (1, 2)
+]
+
+
+def read_bytes(file_path):
+    with open(file_path, "rb") as file:
+        return file.read()
+
+
+class TestMergeServer(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = MergeServer(
+            port=0,
+            max_workers=2,
+            max_pending_uploads=2,
+            max_upload_size=65536,
+        )
+        self.loop.run_until_complete(self.server.start())
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.addCleanup(self.stop)
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(
+            self.server.close(), self.loop
+        ).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def connect(self):
+        connection = http.client.HTTPConnection(
+            "127.0.0.1", self.server.port, timeout=10
+        )
+        self.addCleanup(connection.close)
+        return connection
+
+    def request(self, connection, method, path, body=None):
+        connection.request(method, path, body=body)
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def test_merge_junit_over_one_connection(self):
+        connection = self.connect()
+        for file_path in JUNIT_FILES:
+            upload = read_bytes(file_path)
+            status, body = self.request(
+                connection, "POST", "/runs/nightly/junit", upload
+            )
+            assert status == 200
+        sock = connection.sock
+        summary = json.loads(body)
+        assert summary["uploads"] == 3
+        assert summary["tests"] == 9
+
+        status, body = self.request(connection, "GET", "/runs/nightly/junit")
+        assert status == 200
+        assert connection.sock is sock
+        test_suite = parse_junit_xml([io.BytesIO(body)]).test_suites[0]
+        assert test_suite.tests == 9
+        assert test_suite.errors == 1
+        assert test_suite.failures == 1
+        assert test_suite.skipped == 1
+
+    def test_concurrent_uploads(self):
+        def upload(file_path):
+            connection = self.connect()
+            return self.request(
+                connection, "POST", "/runs/ci/html", read_bytes(file_path)
+            )
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(upload, REPORT_HTML_FILES * 3))
+        assert [status for status, _ in results] == [200] * 6
+
+        status, body = self.request(self.connect(), "GET", "/runs/ci/html")
+        assert status == 200
+        selector = Selector(text=body.decode())
+        assert selector.css("span.passed::text").get() == "4 passed"
+        assert len(selector.css("tbody.results-table-row")) == 7
+
+    def test_errors(self):
+        connection = self.connect()
+        assert self.request(connection, "GET", "/runs/missing/junit")[0] == 404
+        assert self.request(connection, "GET", "/unknown")[0] == 404
+        assert self.request(connection, "PUT", "/runs/ci/junit", b"")[0] == 405
+        status, _ = self.request(connection, "POST", "/runs/ci/junit", b"<")
+        assert status == 400
+        assert "ci" not in self.server.runs
+
+        status, _ = self.request(
+            connection, "POST", "/runs/ci/junit", b" " * 65537
+        )
+        assert status == 413
+
+    def raw_request(self, request):
+        with socket.create_connection(
+            ("127.0.0.1", self.server.port), timeout=10
+        ) as sock:
+            sock.sendall(request)
+            response = b""
+            while True:
+                data = sock.recv(65536)
+                if not data:
+                    return response
+                response += data
+
+    def test_bad_framing(self):
+        response = self.raw_request(
+            b"POST /runs/ci/junit HTTP/1.1\r\nContent-Length: -5\r\n\r\n"
+        )
+        assert response.startswith(b"HTTP/1.1 400 ")
+
+        # The chunked body must not be read as the next request
+        response = self.raw_request(
+            b"POST /runs/ci/junit HTTP/1.1\r\n"
+            b"Transfer-Encoding: chunked\r\n\r\n"
+            b"5\r\nhello\r\n0\r\n\r\n"
+        )
+        assert response.startswith(b"HTTP/1.1 411 ")
+        assert response.count(b"HTTP/1.1") == 1
+        assert b"Connection: close" in response
+
+        response = self.raw_request(
+            b"GET /runs/ci/junit HTTP/1.1\r\nX-Long: "
+            + b"x" * 100_000
+            + b"\r\n\r\n"
+        )
+        assert response.startswith(b"HTTP/1.1 431 ")
+
+    def test_expect_continue(self):
+        upload = read_bytes(JUNIT_FILES[1])
+        with socket.create_connection(
+            ("127.0.0.1", self.server.port), timeout=10
+        ) as sock:
+            sock.sendall(
+                b"POST /runs/ci/junit HTTP/1.1\r\n"
+                b"Expect: 100-continue\r\n"
+                + f"Content-Length: {len(upload)}\r\n\r\n".encode()
+            )
+            assert sock.recv(65536) == b"HTTP/1.1 100 Continue\r\n\r\n"
+            sock.sendall(upload)
+            assert sock.recv(65536).startswith(b"HTTP/1.1 200 ")
+
+        response = self.raw_request(
+            b"POST /runs/ci/junit HTTP/1.1\r\n"
+            b"Expect: something-else\r\nContent-Length: 4\r\n\r\n"
+        )
+        assert response.startswith(b"HTTP/1.1 417 ")
+
+    def test_delete(self):
+        connection = self.connect()
+        self.request(
+            connection, "POST", "/runs/ci/junit", read_bytes(JUNIT_FILES[0])
+        )
+        assert self.request(connection, "DELETE", "/runs/ci")[0] == 200
+        assert self.request(connection, "GET", "/runs/ci/junit")[0] == 404
+        assert self.request(connection, "DELETE", "/runs/ci")[0] == 404
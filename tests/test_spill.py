@@ -0,0 +1,40 @@
+import unittest
+import random
+from unittest.mock import patch
+
+from onefile.spill import SpillSorter
+
+
+class TestSpillSorter(unittest.TestCase):
+    def test_sorted_records(self):
+        records = [(random.randrange(100), str(i)) for i in range(500)]
+        with SpillSorter(lambda record: record, memory_limit=256) as sorter:
+            for record in records:
+                sorter.add(record)
+            assert len(sorter.runs) > 1
+            assert list(sorter.sorted_records()) == sorted(records)
+
+    def test_in_memory(self):
+        with SpillSorter(lambda record: record, memory_limit=1024) as sorter:
+            for record in (3, 1, 2):
+                sorter.add(record)
+            assert sorter.runs == []
+            assert list(sorter.sorted_records()) == [1, 2, 3]
+
+    def test_buffer_holds_only_bytes(self):
+        with SpillSorter(
+            lambda record: record[0], memory_limit=1024
+        ) as sorter:
+            for record in ((2, "b"), (1, "a")):
+                sorter.add(record)
+            assert all(isinstance(data, bytes) for data in sorter.buffer)
+            assert sorter.buffer_size == sum(map(len, sorter.buffer))
+            assert list(sorter.sorted_records()) == [(1, "a"), (2, "b")]
+
+    def test_bounded_open_runs(self):
+        with patch("onefile.spill.MAX_OPEN_RUNS", 4):
+            with SpillSorter(lambda record: record, memory_limit=1) as sorter:
+                for record in range(20, 0, -1):
+                    sorter.add(record)
+                assert len(sorter.runs) < 4
+                assert list(sorter.sorted_records()) == list(range(1, 21))
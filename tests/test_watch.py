@@ -0,0 +1,176 @@
+import unittest
+import contextlib
+import os
+import shutil
+import stat
+import tempfile
+from parsel import Selector
+from unittest.mock import patch
+
+from onefile.junit import parse_junit_xml, merge_test_suites
+from onefile.watch import JunitWatcher, ReportHtmlWatcher, ShardWatcher
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+JUNIT_DIR = os.path.join(TEST_DIR, "junit")
+REPORT_HTML_DIR = os.path.join(TEST_DIR, "report_html")
+
+
+class TestJunitWatcher(unittest.TestCase):
+    def setUp(self):
+        self.shard_dir = tempfile.mkdtemp()
+        self.output_path = os.path.join(self.shard_dir, "junit.xml")
+        self.addCleanup(shutil.rmtree, self.shard_dir)
+
+    def add_shard(self, name):
+        shutil.copy(os.path.join(JUNIT_DIR, name), self.shard_dir)
+
+    def read_output(self):
+        return merge_test_suites(parse_junit_xml([self.output_path]))
+
+    def test_fold_shards_as_they_land(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=0
+        )
+        assert watcher.poll() is False
+        assert not os.path.exists(self.output_path)
+
+        self.add_shard("junit_0.xml")
+        assert watcher.poll() is True
+        assert self.read_output().tests == 1
+
+        self.add_shard("junit_1.xml")
+        self.add_shard("junit_2.xml")
+        assert watcher.poll() is True
+        final_test_suite = self.read_output()
+        assert final_test_suite.tests == 9
+        assert final_test_suite.errors == 1
+        assert final_test_suite.failures == 1
+        assert final_test_suite.skipped == 1
+
+        assert watcher.poll() is False
+        assert not [
+            name for name in os.listdir(self.shard_dir) if name.startswith(".")
+        ]
+
+    def test_debounce(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=10
+        )
+        self.add_shard("junit_1.xml")
+        assert watcher.poll(now=0) is False
+        assert watcher.poll(now=5) is False
+        assert watcher.poll(now=10) is True
+        assert self.read_output().tests == 8
+
+    def test_changed_shard(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=0
+        )
+        self.add_shard("junit_1.xml")
+        self.add_shard("junit_2.xml")
+        assert watcher.poll() is True
+        assert self.read_output().tests == 9
+
+        shutil.copy(
+            os.path.join(JUNIT_DIR, "junit_0.xml"),
+            os.path.join(self.shard_dir, "junit_2.xml"),
+        )
+        assert watcher.poll() is True
+        assert self.read_output().tests == 8
+
+    def test_deleted_shard(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=0
+        )
+        self.add_shard("junit_1.xml")
+        self.add_shard("junit_2.xml")
+        assert watcher.poll() is True
+
+        os.remove(os.path.join(self.shard_dir, "junit_1.xml"))
+        assert watcher.poll() is True
+        assert self.read_output().tests == 1
+
+        shutil.copy(
+            os.path.join(JUNIT_DIR, "junit_0.xml"),
+            os.path.join(self.shard_dir, "junit_2.xml"),
+        )
+        assert watcher.poll() is True
+        assert self.read_output().tests == 1
+        assert watcher.poll() is False
+
+    def test_output_mode(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=0
+        )
+        self.add_shard("junit_1.xml")
+        umask = os.umask(0o022)
+        try:
+            assert watcher.poll() is True
+        finally:
+            os.umask(umask)
+        assert stat.S_IMODE(os.stat(self.output_path).st_mode) == 0o644
+
+        os.chmod(self.output_path, 0o664)
+        self.add_shard("junit_2.xml")
+        assert watcher.poll() is True
+        assert stat.S_IMODE(os.stat(self.output_path).st_mode) == 0o664
+
+    def test_shard_vanishes_while_scanning(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=0
+        )
+        self.add_shard("junit_1.xml")
+        self.add_shard("junit_2.xml")
+        scandir = os.scandir
+
+        def scandir_then_delete(path):
+            entries = list(scandir(path))
+            os.remove(os.path.join(self.shard_dir, "junit_2.xml"))
+            return contextlib.nullcontext(entries)
+
+        with patch("onefile.watch.os.scandir", scandir_then_delete):
+            assert watcher.poll() is True
+        assert self.read_output().tests == 8
+
+    def test_abstract_base_class(self):
+        with self.assertRaises(TypeError):
+            ShardWatcher(self.shard_dir, self.output_path, "*.xml")
+
+    def test_unparsable_shard(self):
+        watcher = JunitWatcher(
+            self.shard_dir, self.output_path, debounce=0
+        )
+        self.add_shard("junit_1.xml")
+        with open(os.path.join(self.shard_dir, "partial.xml"), "w") as fp:
+            fp.write("<testsuites><testsuite")
+        assert watcher.poll() is True
+        assert self.read_output().tests == 8
+
+
+class TestReportHtmlWatcher(unittest.TestCase):
+    def test_fold_shards(self):
+        with tempfile.TemporaryDirectory() as shard_dir:
+            output_path = os.path.join(shard_dir, "report.html")
+            watcher = ReportHtmlWatcher(shard_dir, output_path, debounce=0)
+            for name in ("report_1.html", "report_2.html"):
+                shutil.copy(os.path.join(REPORT_HTML_DIR, name), shard_dir)
+            assert watcher.poll() is True
+            with open(output_path) as report_html:
+                selector = Selector(text=report_html.read())
+            assert len(selector.css("tbody.results-table-row")) == 7
+            assert selector.css("span.passed::text").get() == "4 passed"
+
+    def test_partial_shard(self):
+        with tempfile.TemporaryDirectory() as shard_dir:
+            output_path = os.path.join(shard_dir, "report.html")
+            watcher = ReportHtmlWatcher(shard_dir, output_path, debounce=0)
+            shutil.copy(
+                os.path.join(REPORT_HTML_DIR, "report_1.html"), shard_dir
+            )
+            with open(os.path.join(shard_dir, "partial.html"), "w") as fp:
+                fp.write(
+                    "<html><p>Report generated on 08-Mar-2024 at 06:57:30 "
+                    "by <a>pytest-html</a> v4</p><h2>Summary</h2><p>7 tests"
+                )
+            assert watcher.poll() is True
+            assert os.path.exists(output_path)